@@ -130,7 +130,7 @@ try:
         decision_data = run_decision_engine(df, risk_data, valuation_data, thesis_data, opportunity_data, events_data)
         st.write("✓ Strategic Decisions Generated")
         opt_data = run_optimization_engine(df, market_data, total_value)
-        mc_data = run_monte_carlo_engine(df, market_data, total_value)
+        mc_data = run_monte_carlo_engine(df, market_data, total_value, return_paths=True)
         st.write("✓ Quant Lab Simulations Completed")
         
         status.update(label="Core Analysis Complete. Engaging AI...", state="running", expanded=True)
@@ -1,8 +1,51 @@
 import yfinance as yf
 import pandas as pd
+import concurrent.futures
 from core.schema import MarketData
-# UPDATED IMPORT: Added suffix constants to filter them out
-from utils.constants import SECTOR_CAPTAINS, NON_EQUITY_SUFFIXES, NON_EQUITY_SERIES
+# UPDATED IMPORT: Instrument classifier filters out non-equity suffixes
+from utils.constants import CAPTAIN_TO_SECTOR, classify_instrument
+
+# Fundamentals are fetched per ticker over HTTP; threads overlap the network waits
+FETCH_WORKERS = 16
+
+def _fetch_fundamentals(ticker) -> tuple:
+    """
+    Pulls metadata, statements and news for a single yfinance Ticker.
+    Each field degrades independently so one failing endpoint doesn't drop the rest.
+    Returns: (info, financials, balance_sheet, news)
+    """
+    # A. METADATA (CRITICAL RESTORATION)
+    try:
+        full_info = ticker.info
+        # Fallback to fast_info if info fails (common YF bug)
+        if not full_info:
+            fi = ticker.fast_info
+            full_info = {
+                "previousClose": fi.previous_close,
+                "marketCap": fi.market_cap,
+                "currency": fi.currency
+            }
+    except Exception:
+        full_info = {}
+
+    # B. FINANCIALS
+    try:
+        financials = ticker.financials
+    except:
+        financials = None
+
+    try:
+        balance_sheet = ticker.balance_sheet
+    except:
+        balance_sheet = None
+
+    # C. NEWS
+    try:
+        news = ticker.news
+    except:
+        news = []
+
+    return full_info, financials, balance_sheet, news
 
 def fetch_market_data(user_symbols: list[str]) -> MarketData:
     """
@@ -12,9 +55,7 @@ def fetch_market_data(user_symbols: list[str]) -> MarketData:
     """
     
     # 1. Prepare Symbols
-    captain_symbols = set()
-    for captains in SECTOR_CAPTAINS.values():
-        captain_symbols.update(captains)
+    captain_symbols = set(CAPTAIN_TO_SECTOR)
         
     unique_symbols = list(set([s.strip().upper() for s in user_symbols]) | captain_symbols)
     
@@ -25,7 +66,7 @@ def fetch_market_data(user_symbols: list[str]) -> MarketData:
     for sym in unique_symbols:
         # --- NEW FILTERING LOGIC ---
         # Skip Sovereign Gold Bonds (-GB) and Restricted Series (-BE)
-        if sym.endswith(NON_EQUITY_SUFFIXES) or sym.endswith(NON_EQUITY_SERIES):
+        if classify_instrument(sym) != "Equity":
             continue
         # ---------------------------
 
@@ -73,46 +114,31 @@ def fetch_market_data(user_symbols: list[str]) -> MarketData:
     # --- 3. DETAILED FUNDAMENTALS (Valuation/Thesis Data) ---
     print("   ↳ Fetching Deep Fundamentals (This may take a moment)...")
     
-    for api_sym in api_tickers_list:
-        internal_sym = symbol_map.get(api_sym)
-        if not internal_sym: continue
-        
-        try:
-            ticker = tickers.tickers[api_sym]
-            
-            # A. METADATA (CRITICAL RESTORATION)
-            try:
-                full_info = ticker.info
-                # Fallback to fast_info if info fails (common YF bug)
-                if not full_info:
-                    fi = ticker.fast_info
-                    full_info = {
-                        "previousClose": fi.previous_close,
-                        "marketCap": fi.market_cap,
-                        "currency": fi.currency
-                    }
-                data.info[internal_sym] = full_info
-            except Exception:
-                data.info[internal_sym] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        future_to_symbol = {}
+        for api_sym in api_tickers_list:
+            internal_sym = symbol_map.get(api_sym)
+            if not internal_sym: continue
 
-            # B. FINANCIALS
             try:
-                data.financials[internal_sym] = ticker.financials
-            except:
-                data.financials[internal_sym] = None
+                ticker = tickers.tickers[api_sym]
+            except Exception as e:
+                print(f"❌ Error processing {internal_sym}: {str(e)}")
+                continue
+            future_to_symbol[executor.submit(_fetch_fundamentals, ticker)] = internal_sym
 
+        # Results are written back on the calling thread only
+        for future in concurrent.futures.as_completed(future_to_symbol):
+            internal_sym = future_to_symbol[future]
             try:
-                data.balance_sheet[internal_sym] = ticker.balance_sheet
-            except:
-                data.balance_sheet[internal_sym] = None
-                
-            # C. NEWS
-            try:
-                data.news[internal_sym] = ticker.news
-            except:
-                data.news[internal_sym] = []
+                info, financials, balance_sheet, news = future.result()
+            except Exception as e:
+                print(f"❌ Error processing {internal_sym}: {str(e)}")
+                continue
+
+            data.info[internal_sym] = info
+            data.financials[internal_sym] = financials
+            data.balance_sheet[internal_sym] = balance_sheet
+            data.news[internal_sym] = news
 
-        except Exception as e:
-            print(f"❌ Error processing {internal_sym}: {str(e)}")
-            
     return data
\ No newline at end of file
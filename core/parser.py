@@ -1,6 +1,7 @@
 import pandas as pd
 from utils.constants import REQUIRED_ZERODHA_COLUMNS, ZERODHA_COLUMN_MAP
-from utils.constants import classify_instrument
+from utils.constants import ZERODHA_EXPECTED_ORDER, ZERODHA_RENAMED_ORDER
+from utils.constants import classify_instruments
 
 
 class HoldingsParseError(Exception):
@@ -15,18 +16,22 @@ def load_and_validate_holdings(csv_file) -> pd.DataFrame:
 
     df = pd.read_csv(csv_file)
 
-    # --- Column validation ---
-    missing = REQUIRED_ZERODHA_COLUMNS - set(df.columns)
-    if missing:
-        raise HoldingsParseError(
-            f"Missing required columns: {missing}"
-        )
+    if tuple(df.columns) == ZERODHA_EXPECTED_ORDER:
+        # Fast path: exact Zerodha layout, relabel positionally
+        df.columns = ZERODHA_RENAMED_ORDER
+    else:
+        # --- Column validation ---
+        missing = REQUIRED_ZERODHA_COLUMNS.difference(df.columns)
+        if missing:
+            raise HoldingsParseError(
+                f"Missing required columns: {', '.join(sorted(missing))}"
+            )
 
-    # --- Rename to internal schema ---
-    df = df.rename(columns=ZERODHA_COLUMN_MAP)
+        # --- Rename to internal schema ---
+        df = df.rename(columns=ZERODHA_COLUMN_MAP)
 
-    # --- Keep only required internal columns ---
-    df = df[list(ZERODHA_COLUMN_MAP.values())]
+        # --- Keep only required internal columns ---
+        df = df[list(ZERODHA_RENAMED_ORDER)]
 
     # --- Basic sanity checks ---
     if (df["quantity"] <= 0).any():
@@ -37,7 +42,7 @@ def load_and_validate_holdings(csv_file) -> pd.DataFrame:
 
     # --- Normalize symbol format ---
     df["symbol"] = df["symbol"].astype(str).str.strip().str.upper()
-    df["instrument_type"] = df["symbol"].apply(classify_instrument)
+    df["instrument_type"] = classify_instruments(df["symbol"])
 
     return df
 
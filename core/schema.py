@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import pandas as pd
 
 @dataclass
@@ -21,6 +21,10 @@ class MarketData:
 
     def get_balance_sheet(self, symbol: str) -> Optional[pd.DataFrame]:
         return self.balance_sheet.get(symbol)
+
+    def get_statements(self, symbol: str) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+        """(financials, balance_sheet) for a symbol in one call."""
+        return self.financials.get(symbol), self.balance_sheet.get(symbol)
         
     def get_news(self, symbol: str) -> list:
         return self.news.get(symbol, [])
\ No newline at end of file
@@ -0,0 +1,40 @@
+import pandas as pd
+
+# --- IMPORT ENGINES ---
+from core.schema import MarketData
+from engines.valuation import run_valuation_engine, VALUATION_COLUMNS
+from engines.thesis import run_thesis_engine
+from utils.constants import classify_instruments
+
+# --- MOCK DATA ---
+# No network needed: a portfolio with nothing to score (SGB / BE only), plus an
+# equity whose statements failed to download (what a yfinance outage looks like).
+print("1. Creating Mock Portfolios...")
+portfolios = {
+    "Non-Equity Only": ["SGBJUN31I-GB", "ESSARSHPNG-BE"],
+    "Equity Without Statements": ["HDFCBANK", "SGBJUN31I-GB"],
+}
+market_data = MarketData()
+
+# --- DEBUGGING STEP: COLUMNAR (as_frame) OUTPUT ---
+print("\n2. Running Engines with as_frame=True...")
+for label, symbols in portfolios.items():
+    df = pd.DataFrame({"symbol": symbols})
+    df["instrument_type"] = classify_instruments(df["symbol"])
+
+    thesis_frame = run_thesis_engine(df, market_data, as_frame=True)
+    valuation_frame = run_valuation_engine(df, market_data, as_frame=True)
+
+    print(f"\n   [RESULT] {label}:")
+    print(f"   -> Thesis columns: {list(thesis_frame.columns)}")
+    print(f"   -> Valuation columns: {list(valuation_frame.columns)}")
+
+    assert list(thesis_frame.index) == symbols, "Thesis frame lost holdings"
+    assert list(thesis_frame.columns) == ["status", "drivers", "sector", "score"], "Thesis schema drifted"
+    assert thesis_frame["score"].dtype == "float32"
+
+    assert list(valuation_frame.index) == symbols, "Valuation frame lost holdings"
+    assert list(valuation_frame.columns) == VALUATION_COLUMNS + ["sector"], "Valuation schema drifted"
+    assert valuation_frame["stress_score"].dtype == "int16"
+
+print("\n   [OK] Both as_frame paths hold their schema.")
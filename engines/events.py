@@ -150,9 +150,9 @@ def run_events_engine(df, thesis_data, market_data):
     results = []
     cutoff_date = datetime.now(timezone.utc) - timedelta(days=RECENT_DAYS)
 
-    for _, row in df.iterrows():
-        symbol = row["symbol"]
-        if row.get("instrument_type", "Equity") != "Equity":
+    for row in df.itertuples(index=False):
+        symbol = row.symbol
+        if getattr(row, "instrument_type", "Equity") != "Equity":
             continue
 
         thesis = thesis_data.get(symbol, {})
@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from utils.constants import SECTOR_MAP, SECTOR_CAPTAINS
+from utils.constants import SECTOR_CAPTAINS, sector_of
 
 # --- CONFIGURATION ---
 W_THESIS = 0.45      
@@ -164,9 +164,9 @@ def evaluate_premium_switch(holding_sym: str, candidate_sym: str, market_data, h
 def run_opportunity_cost_engine(df, risk_data, valuation_data, thesis_data, market_data):
     results = {}
 
-    for _, row in df.iterrows():
-        symbol = row["symbol"]
-        if row.get("instrument_type", "Equity") != "Equity": continue
+    for row in df.itertuples(index=False):
+        symbol = row.symbol
+        if getattr(row, "instrument_type", "Equity") != "Equity": continue
 
         # Gather Inputs
         thesis = thesis_data.get(symbol, {})
@@ -202,7 +202,7 @@ def run_opportunity_cost_engine(df, risk_data, valuation_data, thesis_data, mark
         replacement_candidates = None
         
         if bucket in ["Replace", "Monitor"]:
-            sector = SECTOR_MAP.get(symbol, "Unknown")
+            sector = sector_of(symbol)
             if sector == "Unknown":
                 y_info = market_data.info.get(symbol, {})
                 sector = map_yahoo_to_internal(y_info)
@@ -11,9 +11,9 @@ def _prepare_price_matrix(df, market_data):
     price_frames = []
     valid_symbols = []
 
-    for _, row in df.iterrows():
-        sym = row["symbol"]
-        if row["instrument_type"] != "Equity":
+    for row in df.itertuples(index=False):
+        sym = row.symbol
+        if row.instrument_type != "Equity":
             continue
             
         hist = market_data.price_history.get(sym)
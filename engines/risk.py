@@ -1,12 +1,12 @@
 import pandas as pd
 import numpy as np
-from collections import defaultdict
-from utils.constants import SECTOR_MAP, RISK_THRESHOLDS
+from utils.constants import SECTOR_NAMES, SECTOR_CODE_MAP, SINGLE_STOCK_HIGH
 
 # --- CONSTANTS ---
 BENCHMARK_SYMBOL = "^NSEI"  # Nifty 50
 TRADING_DAYS = 252
 CONFIDENCE_LEVEL = 1.65     # 95% Confidence (Z-score)
+_SECTOR_LABELS = SECTOR_NAMES + ("Other",) # indexed by sector code, "Other" = unmapped
 
 def calculate_dynamic_metrics(stock_hist: pd.DataFrame, benchmark_hist: pd.DataFrame):
     """
@@ -15,36 +15,54 @@ def calculate_dynamic_metrics(stock_hist: pd.DataFrame, benchmark_hist: pd.DataF
     """
     if stock_hist is None or benchmark_hist is None or stock_hist.empty or benchmark_hist.empty:
         return 1.0, 0.20 # Fallbacks: Beta 1.0, Vol 20%
+    if "Close" not in stock_hist or "Close" not in benchmark_hist:
+        return 1.0, 0.20
 
     # 1. Align Data (Intersection of dates)
     # We use 'Close' prices. Ensure indexes are datetime.
-    try:
-        df = pd.DataFrame({
-            'stock': stock_hist['Close'],
-            'market': benchmark_hist['Close']
-        }).dropna()
+    df = pd.DataFrame({
+        'stock': stock_hist['Close'],
+        'market': benchmark_hist['Close']
+    }).dropna()
+
+    if len(df) < 60: # Need at least 2-3 months of data for valid beta
+        return 1.0, 0.20
 
-        if len(df) < 60: # Need at least 2-3 months of data for valid beta
-            return 1.0, 0.20
+    # (2, T) C-contiguous price block: each series is a contiguous row, so the
+    # time-axis diff/log/cov below run at unit stride.
+    prices = np.ascontiguousarray(df.to_numpy(dtype=np.float64).T)
 
+    # Bad ticks (zero/negative prices, flat benchmark) surface as non-finite
+    # results below instead of raising.
+    with np.errstate(divide="ignore", invalid="ignore"):
         # 2. Calculate Log Returns
         # Log returns are additive and better for statistical analysis
-        log_rets = np.log(df / df.shift(1)).dropna()
+        log_rets = np.diff(np.log(prices), axis=1)
 
         # 3. Calculate Beta (Covariance / Variance)
         # Cov(Stock, Market) / Var(Market)
-        cov_matrix = np.cov(log_rets['stock'], log_rets['market'])
+        cov_matrix = np.cov(log_rets)
         beta = cov_matrix[0, 1] / cov_matrix[1, 1]
 
         # 4. Calculate Annualized Volatility
-        volatility = log_rets['stock'].std() * np.sqrt(TRADING_DAYS)
-        
-        return round(beta, 2), round(volatility, 2)
+        volatility = log_rets[0].std(ddof=1) * np.sqrt(TRADING_DAYS)
 
-    except Exception as e:
-        print(f"Risk Calc Error: {e}")
+    if not (np.isfinite(beta) and np.isfinite(volatility)):
         return 1.0, 0.20
 
+    return round(beta, 2), round(volatility, 2)
+
+
+def top_weights(weights: np.ndarray):
+    """
+    Largest single weight and the sum of the three largest, over a float array.
+    Returns: (top1, top3)
+    """
+    if weights.size == 0:
+        return 0.0, 0.0
+    k = min(3, weights.size)
+    top = -np.sort(-np.partition(weights, weights.size - k)[weights.size - k:]) # k largest, descending
+    return float(top[0]), float(top.sum())
 
 def run_risk_engine(df: pd.DataFrame, market_data) -> dict:
     """
@@ -62,98 +80,98 @@ def run_risk_engine(df: pd.DataFrame, market_data) -> dict:
         nifty_hist = market_data.price_history.get("NIFTY 50.NS")
 
     # --- 2. HOLDING-LEVEL METRICS ---
-    holdings_risk = {}
-    total_weighted_beta = 0.0
-    total_var_95 = 0.0
-    
-    # Aggregators
-    sector_exposure = defaultdict(float)
-    size_exposure = defaultdict(float)
-
-    for _, row in df.iterrows():
-        symbol = row["symbol"]
-        weight_pct = row["weight_pct"]
-        invested_val = row["current_value"]
-        
-        # A. Get Asset Class Specifics
-        if row.get("instrument_type") == "Equity":
-            # 1. Fetch History
-            stock_hist = market_data.price_history.get(symbol)
-            
-            # 2. Calculate Real Metrics
-            beta, vol = calculate_dynamic_metrics(stock_hist, nifty_hist)
-            
-            # 3. Calculate Value at Risk (VaR)
-            # "How much could I lose in 1 day with 95% confidence?"
-            # Formula: Value * Volatility (Daily) * Z-Score (1.65)
-            daily_vol = vol / np.sqrt(TRADING_DAYS)
-            var_value = invested_val * daily_vol * CONFIDENCE_LEVEL
-            
-            # 4. Market Cap Logic (Fallback to fast_info/info if needed)
-            info = market_data.info.get(symbol, {})
-            mcap = info.get("marketCap") or 0
-            
-            if mcap > 20000 * 10**7: size_cat = "Large Cap"
-            elif mcap > 5000 * 10**7: size_cat = "Mid Cap"
-            elif mcap > 0: size_cat = "Small Cap"
-            else: size_cat = "Unknown" # Likely missing data
-            
-        else:
-            # Non-Equity (Gold/Liquid/Cash)
-            beta = 0.05 if "GB" in symbol else 0.0 # Gold has low beta, Cash 0
-            vol = 0.10 if "GB" in symbol else 0.0
-            var_value = invested_val * (vol/np.sqrt(TRADING_DAYS)) * 1.65
-            size_cat = "Cash/Equiv"
-
-        # B. Accumulate Portfolio Stats
-        # Beta contribution = Weight * Beta
-        total_weighted_beta += (weight_pct / 100) * beta
-        
-        # VaR Summation (Conservative approach: assuming perfect correlation 1.0)
-        # In reality, diversification reduces this, but for risk alerts, better to overestimate.
-        total_var_95 += var_value
-        
-        sector_exposure[SECTOR_MAP.get(symbol, "Other")] += weight_pct
-        size_exposure[size_cat] += weight_pct
-
-        # C. Generate Holding Risk Tag
-        # Combine Volatility + Size + Weight
-        risk_tag = "Low"
-        
-        # Logic: Small Cap with High Weight OR Extreme Volatility
-        if size_cat == "Small Cap" and weight_pct > 7.0:
-            risk_tag = "Critical (Liquidity)"
-        elif vol > 0.40: # >40% annualized volatility
-            risk_tag = "High Volatility"
-        elif beta > 1.5 and weight_pct > 5.0:
-            risk_tag = "Aggressive Exposure"
-        elif size_cat == "Small Cap":
-            risk_tag = "Moderate (Small Cap)"
-
-        holdings_risk[symbol] = {
-            "beta": beta,
-            "volatility_annual": vol,
-            "var_95_amt": round(var_value, 2),
-            "size_category": size_cat,
-            "risk_tag": risk_tag,
-            "risk_contribution_score": round(beta * weight_pct, 2)
+    # Metrics are held column-wise (one array per field) and only zipped into
+    # the per-symbol dicts once, at the end.
+    symbols = df["symbol"].to_numpy()
+    weights = df["weight_pct"].to_numpy(dtype=float)
+    values = df["current_value"].to_numpy(dtype=float)
+    is_equity = (df["instrument_type"] == "Equity").to_numpy()
+    n = len(df)
+
+    beta = np.empty(n)
+    vol = np.empty(n)
+    mcap = np.zeros(n)
+
+    # A. Equity: realized Beta/Volatility from price history, Market Cap from info
+    for i in np.flatnonzero(is_equity):
+        symbol = symbols[i]
+        beta[i], vol[i] = calculate_dynamic_metrics(market_data.price_history.get(symbol), nifty_hist)
+        mcap[i] = market_data.info.get(symbol, {}).get("marketCap") or 0
+
+    size_cat = np.select(
+        [mcap > 20000 * 10**7, mcap > 5000 * 10**7, mcap > 0],
+        ["Large Cap", "Mid Cap", "Small Cap"],
+        default="Unknown" # Likely missing data
+    ).astype(object)
+
+    # B. Non-Equity (Gold/Liquid/Cash): Gold has low beta, Cash 0
+    non_equity = ~is_equity
+    is_gold = df["symbol"].str.contains("GB", regex=False).to_numpy()
+    beta[non_equity] = np.where(is_gold[non_equity], 0.05, 0.0)
+    vol[non_equity] = np.where(is_gold[non_equity], 0.10, 0.0)
+    size_cat[non_equity] = "Cash/Equiv"
+
+    # C. Value at Risk (VaR)
+    # "How much could I lose in 1 day with 95% confidence?"
+    # Formula: Value * Volatility (Daily) * Z-Score (1.65)
+    var_value = values * (vol / np.sqrt(TRADING_DAYS)) * CONFIDENCE_LEVEL
+
+    # D. Accumulate Portfolio Stats
+    # Beta contribution = Weight * Beta
+    total_weighted_beta = float(np.sum((weights / 100) * beta))
+
+    # VaR Summation (Conservative approach: assuming perfect correlation 1.0)
+    # In reality, diversification reduces this, but for risk alerts, better to overestimate.
+    total_var_95 = float(np.sum(var_value))
+
+    # E. Generate Holding Risk Tag
+    # Combine Volatility + Size + Weight. Conditions are evaluated in priority order,
+    # the first match wins (Small Cap with High Weight OR Extreme Volatility first).
+    is_small_cap = size_cat == "Small Cap"
+    risk_tag = np.select(
+        [
+            is_small_cap & (weights > 7.0),
+            vol > 0.40, # >40% annualized volatility
+            (beta > 1.5) & (weights > 5.0),
+            is_small_cap,
+        ],
+        ["Critical (Liquidity)", "High Volatility", "Aggressive Exposure", "Moderate (Small Cap)"],
+        default="Low"
+    ).astype(object)
+
+    holdings_risk = {
+        s: {
+            "beta": float(b),
+            "volatility_annual": float(v),
+            "var_95_amt": round(float(var_amt), 2),
+            "size_category": sc,
+            "risk_tag": tag,
+            "risk_contribution_score": round(float(b * w), 2)
         }
+        for s, b, v, var_amt, sc, tag, w in zip(symbols, beta, vol, var_value, size_cat, risk_tag, weights)
+    }
+
+    # Aggregators (single hash-groupby pass instead of per-row dict accumulation)
+    size_exposure = df["weight_pct"].groupby(size_cat, sort=False).sum()
+    # Sectors as int8 codes summed with one bincount; unmapped symbols land in a trailing "Other" slot
+    sector_codes = df["symbol"].map(SECTOR_CODE_MAP).fillna(len(SECTOR_NAMES)).to_numpy(dtype=np.int8)
+    sector_totals = np.bincount(sector_codes, weights=weights, minlength=len(SECTOR_NAMES) + 1)
+    held = pd.unique(sector_codes) # first-appearance order, as the groupby produced
+    sector_exposure = pd.Series(sector_totals[held], index=[_SECTOR_LABELS[code] for code in held])
 
     # --- 3. CONCENTRATION CHECKS ---
-    # Sort for Top N analysis
-    sorted_weights = sorted(df["weight_pct"].tolist(), reverse=True)
-    top1 = sorted_weights[0] if sorted_weights else 0
-    top3 = sum(sorted_weights[:3])
+    top1, top3 = top_weights(weights)
 
     flags = []
     
     # Check 1: Single Stock
-    if top1 > RISK_THRESHOLDS.get("single_stock_high", 15):
+    if top1 > SINGLE_STOCK_HIGH:
         flags.append(f"Concentration Alert: Single stock is {round(top1,1)}% of portfolio")
         
     # Check 2: Small Cap Overload
-    if size_exposure["Small Cap"] > 35.0:
-        flags.append(f"Liquidity Risk: {round(size_exposure['Small Cap'],1)}% allocated to Small Caps")
+    small_cap_pct = size_exposure.get("Small Cap", 0.0)
+    if small_cap_pct > 35.0:
+        flags.append(f"Liquidity Risk: {round(small_cap_pct,1)}% allocated to Small Caps")
 
     # Check 3: Sector Overload
     for sec, w in sector_exposure.items():
@@ -173,7 +191,7 @@ def run_risk_engine(df: pd.DataFrame, market_data) -> dict:
         "portfolio_beta": round(total_weighted_beta, 2),
         "risk_profile": p_label,
         "daily_var_95": round(total_var_95, 2),
-        "size_allocation": dict(size_exposure)
+        "size_allocation": size_exposure.to_dict()
     }
 
     risk_output["concentration"] = {
@@ -183,7 +201,7 @@ def run_risk_engine(df: pd.DataFrame, market_data) -> dict:
     }
     
     risk_output["sector_exposure"] = {
-        "weights": dict(sector_exposure),
+        "weights": sector_exposure.to_dict(),
         "flags": [] # Handled in concentration flags
     }
 
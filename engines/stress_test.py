@@ -4,54 +4,68 @@ import pandas as pd
 SIMULATION_DAYS = 252 # 1 Year
 NUM_SIMULATIONS = 1000
 
-def run_monte_carlo_engine(df, market_data, total_value):
+def run_monte_carlo_engine(df, market_data, total_value, return_paths: bool = False):
     """
     Runs Monte Carlo simulations on the aggregated portfolio history.
+    Full price paths are only materialized when `return_paths` is set (for plotting).
     """
     # 1. Construct Portfolio Historical Returns
-    weighted_returns = pd.DataFrame()
-    
-    for _, row in df.iterrows():
-        sym = row["symbol"]
-        if row["instrument_type"] != "Equity": continue
+    returns = {}
+    weights = {}
+
+    for row in df.itertuples(index=False):
+        sym = row.symbol
+        if row.instrument_type != "Equity": continue
         
         hist = market_data.price_history.get(sym)
         if hist is None or hist.empty: continue
         
         # Calculate daily log returns
-        daily_ret = np.log(hist['Close'] / hist['Close'].shift(1))
-        weighted_returns[sym] = daily_ret * (row["weight_pct"] / 100)
+        returns[sym] = np.log(hist['Close'] / hist['Close'].shift(1))
+        weights[sym] = row.weight_pct / 100
 
-    if weighted_returns.empty:
+    if not returns:
         return None
 
-    # Aggregate to get Portfolio Daily Return history
-    portfolio_daily_ret = weighted_returns.sum(axis=1).dropna()
+    # Aligned (Date x Ticker) matrix, made C-contiguous so the per-date weighted
+    # sum reads each row sequentially.
+    aligned = pd.concat(returns, axis=1)
+    ret_matrix = np.ascontiguousarray(aligned.to_numpy(dtype=np.float64))
+    w = np.array([weights[sym] for sym in aligned.columns])
+
+    # Aggregate to get Portfolio Daily Return history (missing prices contribute 0)
+    portfolio_daily_ret = np.nansum(ret_matrix * w, axis=1)
     
     # 2. Calculate Drift and Volatility
     u = portfolio_daily_ret.mean()
-    var = portfolio_daily_ret.var()
+    var = portfolio_daily_ret.var(ddof=1)
     drift = u - (0.5 * var)
-    stdev = portfolio_daily_ret.std()
+    stdev = portfolio_daily_ret.std(ddof=1)
 
     # 3. Run Simulations
     # Formula: Pt = Pt-1 * exp(drift + stdev * Z)
-    daily_returns = np.exp(drift + stdev * np.random.normal(0, 1, (SIMULATION_DAYS, NUM_SIMULATIONS)))
-    
-    price_paths = np.zeros_like(daily_returns)
-    price_paths[0] = total_value
-    
-    for t in range(1, SIMULATION_DAYS):
-        price_paths[t] = price_paths[t-1] * daily_returns[t]
+    # Day 0 is the current value, so a path takes SIMULATION_DAYS - 1 steps.
+    # Shocks are filled in place into a C-ordered (day x simulation) buffer.
+    shocks = np.empty((SIMULATION_DAYS - 1, NUM_SIMULATIONS), order="C")
+    np.random.default_rng().standard_normal(out=shocks)
+
+    price_paths = None
+    if return_paths:
+        price_paths = np.empty((SIMULATION_DAYS, NUM_SIMULATIONS))
+        price_paths[0] = total_value
+        price_paths[1:] = total_value * np.exp(np.cumsum(drift + stdev * shocks, axis=0))
+        ending_values = price_paths[-1]
+    else:
+        # Log-returns add up, so the ending value needs only the summed shocks
+        ending_values = total_value * np.exp((SIMULATION_DAYS - 1) * drift + stdev * shocks.sum(axis=0))
 
     # 4. Analyze Results
-    ending_values = price_paths[-1]
     worst_case = np.percentile(ending_values, 5) # 5th percentile (95% confidence)
     best_case = np.percentile(ending_values, 95)
     median_case = np.median(ending_values)
 
     return {
-        "simulation_data": price_paths, # Raw paths for plotting
+        "simulation_data": price_paths, # Raw paths for plotting (None unless return_paths)
         "metrics": {
             "worst_case_1y": worst_case,
             "best_case_1y": best_case,
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
-from utils.constants import SECTOR_MAP
+from functools import lru_cache
+from itertools import compress
+from utils.constants import SECTOR_MAP, sector_of
 
 # --- CONFIGURATION ---
 # Severity Weights (Higher = More Critical)
@@ -9,68 +11,120 @@ W_QUALITY = 2.0        # Earnings manipulation / Moat erosion
 W_MOMENTUM = 1.0       # Standard growth slowdown
 W_DILUTION = 0.5       # Shareholders getting diluted
 
-def get_safe_metric(df: pd.DataFrame, possible_names: list) -> pd.Series:
+# Driver messages (module-level so every ticker shares the same string objects)
+_DRIVERS = {
+    "REV": "Top-line Stagnation: Revenue in structural decline",
+    "PROFITLESS": "Profitless Growth: Revenue up but Profits down",
+    "RECEIVABLES": "Earnings Quality Alert: Receivables growing 1.5x faster than Sales",
+    "ROE": "Moat Erosion: ROE has declined for 3 consecutive years",
+    "COVERAGE": "Critical Solvency Risk: Interest Coverage {}x",
+    "DILUTION": "Shareholder Dilution: Share count increased >5%",
+    "CAPITAL": "Capital Erosion: Book Value declining",
+}
+
+# Deterioration tests in driver order, and the severity each one adds
+_FLAGS = ("REV", "PROFITLESS", "RECEIVABLES", "ROE", "COVERAGE", "DILUTION", "CAPITAL")
+_FLAG_WEIGHTS = np.array([W_MOMENTUM, W_MOMENTUM, W_QUALITY, W_QUALITY, W_SOLVENCY, W_DILUTION, W_SOLVENCY])
+
+# Verdicts indexed by score bucket (Weakening from 1.0, Broken from 3.0)
+_STATUSES = ("Intact", "Weakening", "Broken")
+_STATUS_EDGES = np.array([1.0, 3.0])
+
+@lru_cache(maxsize=None)
+def _resolve_metric_name(index: tuple, possible_names: tuple):
+    """
+    Returns the first alias present in a statement's row index (or None).
+    Cached: yfinance statements share a handful of layouts across tickers.
+    """
+    available = set(index)
+    for name in possible_names:
+        if name in available:
+            return name
+    return None
+
+def get_safe_metric(df: pd.DataFrame, possible_names: tuple) -> pd.Series:
     """
     Robust extractor: Tries multiple column aliases to handle YFinance inconsistencies.
     """
     if df is None or df.empty:
         return None
-    
-    for name in possible_names:
-        if name in df.index:
-            series = df.loc[name]
-            return pd.to_numeric(series, errors='coerce').dropna()
-    return None
+
+    name = _resolve_metric_name(tuple(df.index), tuple(possible_names))
+    if name is None:
+        return None
+
+    row = df.loc[name]
+    # yfinance rows are usually float already; only mixed rows need coercion
+    if row.dtype.kind == 'f':
+        return row.dropna()
+    return pd.to_numeric(row, errors='coerce').dropna()
 
 def calculate_cagr(series: pd.Series, years: int = 3) -> float:
     """Calculates Compound Annual Growth Rate over N years."""
-    if series is None or len(series) < years:
-        return 0.0
-    
-    try:
-        start_val = series.iloc[years-1] # Oldest
-        end_val = series.iloc[0]         # Newest
-        
-        if start_val <= 0 or end_val <= 0: return 0.0
-        
-        return (end_val / start_val)**(1/(years-1)) - 1
-    except:
+    if series is None or years < 2 or len(series) < years:
         return 0.0
 
-def evaluate_trend_structure(series: pd.Series) -> str:
+    start_val = series.iloc[years-1] # Oldest
+    end_val = series.iloc[0]         # Newest
+
+    if start_val <= 0 or end_val <= 0: return 0.0
+
+    return (end_val / start_val)**(1/(years-1)) - 1
+
+def stack_recent_values(series_list: list, depth: int = 3) -> np.ndarray:
     """
-    Analyzes the structural direction of a metric.
-    Returns: 'Improving', 'Stable', 'Deteriorating'
+    Stacks the newest `depth` values of each series into an (N, depth) array.
+    Missing series / short histories are padded with NaN.
     """
-    if series is None or len(series) < 2:
-        return "Unknown"
-    
-    latest = series.iloc[0]
-    prev = series.iloc[1]
-    
-    # Check for immediate shock (>15% drop)
-    if latest < (prev * 0.85):
-        return "Deteriorating"
-
-    # Check for 3-year structural decline
-    if len(series) >= 3:
-        prev_2 = series.iloc[2]
-        if latest < prev and prev < prev_2:
-            return "Deteriorating"
-            
-    if latest > (prev * 1.05):
-        return "Improving"
-        
-    return "Stable"
+    values = np.full((len(series_list), depth), np.nan)
+    for i, series in enumerate(series_list):
+        if series is not None:
+            recent = series.to_numpy(dtype=float)[:depth]
+            values[i, :len(recent)] = recent
+    return values
+
+def evaluate_trend_structure(values: np.ndarray) -> np.ndarray:
+    """
+    Analyzes the structural direction of a metric for many tickers at once.
+    Input: (N, 3) array of [latest, prev, prev_2] rows (NaN-padded).
+    Returns: array of 'Improving', 'Stable', 'Deteriorating' or 'Unknown'
+    """
+    latest, prev, prev_2 = values[:, 0], values[:, 1], values[:, 2]
+
+    # Immediate shock (>15% drop) or 3-year structural decline.
+    # NaN comparisons are False, so short histories skip the checks they lack data for.
+    deteriorating = (latest < prev * 0.85) | ((latest < prev) & (prev < prev_2))
+
+    return np.select(
+        [np.isnan(prev), deteriorating, latest > prev * 1.05],
+        ["Unknown", "Deteriorating", "Improving"],
+        default="Stable"
+    ).astype(object)
 
-def run_thesis_engine(df, market_data):
+def _solvency_kernel(op_inc: np.ndarray, int_exp: np.ndarray, shares: np.ndarray, prev_shares: np.ndarray):
+    """
+    Interest coverage & dilution tests over flat float arrays (NaN = missing).
+    Returns: (coverage, critical_coverage, diluted)
+    """
+    interest = np.abs(int_exp)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coverage = np.where(interest > 0, op_inc / interest, np.nan)
+
+    critical_coverage = coverage < 1.5
+    diluted = shares > (prev_shares * 1.05) # >5% dilution (Are they selling shares to survive?)
+    return coverage, critical_coverage, diluted
+
+def run_thesis_engine(df, market_data, as_frame: bool = False):
     """
     Premium Thesis Engine:
     Evaluates Solvency, Earnings Quality, Capital Efficiency, and Growth.
+    as_frame=True returns a symbol-indexed DataFrame (status, drivers, sector, score)
+    instead of the dict of dicts; unscored rows get their mapped sector and a 0.0 score.
     """
     thesis_output = {}
+    analyzed = [] # (symbol, metrics) for holdings with statements
 
-    for _, row in df.iterrows():
+    for row in df[["symbol", "instrument_type"]].to_dict("records"):
         symbol = row["symbol"]
         
         # 1. Skip Non-Equity
@@ -79,106 +133,110 @@ def run_thesis_engine(df, market_data):
             continue
 
         # 2. Retrieve Data
-        financials = market_data.get_financials(symbol)
-        balance_sheet = market_data.get_balance_sheet(symbol)
+        financials, balance_sheet = market_data.get_statements(symbol)
         
         if financials is None or balance_sheet is None:
             thesis_output[symbol] = {"status": "Insufficient Data", "drivers": []}
             continue
 
         # 3. Extract Metrics (Expanded for Premium Analysis)
-        # Income Statement
-        rev = get_safe_metric(financials, ["Total Revenue", "Operating Revenue", "Revenue"])
-        net_inc = get_safe_metric(financials, ["Net Income", "Net Income Common Stockholders"])
-        op_inc = get_safe_metric(financials, ["Operating Income", "EBIT"])
-        int_exp = get_safe_metric(financials, ["Interest Expense", "Interest Expense Non Operating"])
-        
-        # Balance Sheet
-        debt = get_safe_metric(balance_sheet, ["Total Debt", "Long Term Debt", "Long Term Debt And Capital Lease Obligation"])
-        equity = get_safe_metric(balance_sheet, ["Stockholders Equity", "Total Stockholder Equity"])
-        receivables = get_safe_metric(balance_sheet, ["Net Receivables", "Accounts Receivable"])
-        shares = get_safe_metric(balance_sheet, ["Share Issued", "Ordinary Shares Number"])
-
-        # 4. Analysis Logic
-        drivers = []
-        deterioration_score = 0.0
-        sector = SECTOR_MAP.get(symbol, "Unknown")
-        is_financial = (sector == "Financials")
-        
-        # --- PILLAR 1: GROWTH & MOMENTUM ---
-        rev_trend = evaluate_trend_structure(rev)
-        inc_trend = evaluate_trend_structure(net_inc)
-        
-        if rev_trend == "Deteriorating":
-            drivers.append("Top-line Stagnation: Revenue in structural decline")
-            deterioration_score += W_MOMENTUM
-            
-        if inc_trend == "Deteriorating" and rev_trend != "Deteriorating":
-            drivers.append("Profitless Growth: Revenue up but Profits down")
-            deterioration_score += W_MOMENTUM
+        metrics = {
+            # Income Statement
+            "rev": get_safe_metric(financials, ("Total Revenue", "Operating Revenue", "Revenue")),
+            "net_inc": get_safe_metric(financials, ("Net Income", "Net Income Common Stockholders")),
+            "op_inc": get_safe_metric(financials, ("Operating Income", "EBIT")),
+            "int_exp": get_safe_metric(financials, ("Interest Expense", "Interest Expense Non Operating")),
+
+            # Balance Sheet
+            "debt": get_safe_metric(balance_sheet, ("Total Debt", "Long Term Debt", "Long Term Debt And Capital Lease Obligation")),
+            "equity": get_safe_metric(balance_sheet, ("Stockholders Equity", "Total Stockholder Equity")),
+            "receivables": get_safe_metric(balance_sheet, ("Net Receivables", "Accounts Receivable")),
+            "shares": get_safe_metric(balance_sheet, ("Share Issued", "Ordinary Shares Number")),
+        }
+        thesis_output[symbol] = None # Filled below; keeps portfolio order
+        analyzed.append((symbol, metrics))
+
+    # Trend structure for every analyzed ticker in one vectorized pass per metric
+    rev_trends = evaluate_trend_structure(stack_recent_values([m["rev"] for _, m in analyzed]))
+    inc_trends = evaluate_trend_structure(stack_recent_values([m["net_inc"] for _, m in analyzed]))
+    equity_trends = evaluate_trend_structure(stack_recent_values([m["equity"] for _, m in analyzed]))
+
+    # ROE on the statement dates where both Net Income and Equity exist:
+    # one aligned (date x ticker) divide instead of a per-ticker index intersection.
+    net_inc_df = pd.DataFrame({i: m["net_inc"] for i, (_, m) in enumerate(analyzed) if m["net_inc"] is not None})
+    equity_df = pd.DataFrame({i: m["equity"] for i, (_, m) in enumerate(analyzed) if m["equity"] is not None})
+    net_inc_df, equity_df = net_inc_df.align(equity_df)
+    common = (net_inc_df.notna() & equity_df.notna()).sort_index(ascending=False)
+    # Zero equity stays in the window (x/0 -> +/-inf, 0/0 -> NaN) rather than being skipped over
+    roe_df = (net_inc_df / equity_df).sort_index(ascending=False)
+    roe = stack_recent_values([roe_df[i][common[i]] if i in roe_df else None for i in range(len(analyzed))])
+    roe_declining = (roe[:, 0] < roe[:, 1]) & (roe[:, 1] < roe[:, 2])
+
+    sectors = [sector_of(symbol) for symbol, _ in analyzed]
+    is_financial = np.array([sector == "Financials" for sector in sectors], dtype=bool)
+
+    # 4. Analysis Logic: one boolean column per deterioration test (see _FLAGS)
+    flags = np.zeros((len(analyzed), len(_FLAGS)), dtype=bool)
+
+    # --- PILLAR 1: GROWTH & MOMENTUM ---
+    flags[:, _FLAGS.index("REV")] = rev_trends == "Deteriorating"
+    flags[:, _FLAGS.index("PROFITLESS")] = (inc_trends == "Deteriorating") & (rev_trends != "Deteriorating")
+
+    # --- PILLAR 3: CAPITAL EFFICIENCY (ROE / ROIC) ---
+    # Are they losing their competitive advantage?
+    flags[:, _FLAGS.index("ROE")] = roe_declining
+
+    # Financials: Check Book Value Erosion
+    flags[:, _FLAGS.index("CAPITAL")] = is_financial & (equity_trends == "Deteriorating")
+
+    for i, (symbol, metrics) in enumerate(analyzed):
+        if is_financial[i]:
+            continue
+        rev, receivables = metrics["rev"], metrics["receivables"]
 
         # --- PILLAR 2: EARNINGS QUALITY (The "Cooking Books" Check) ---
         # If Receivables grow significantly faster than Revenue, sales might be artificial.
-        if not is_financial and receivables is not None and rev is not None and len(rev) > 1:
+        if receivables is not None and rev is not None and len(rev) > 1:
             rev_growth = calculate_cagr(rev)
             rec_growth = calculate_cagr(receivables)
-            
-            if rev_growth > 0 and rec_growth > (rev_growth * 1.5):
-                drivers.append(f"Earnings Quality Alert: Receivables growing 1.5x faster than Sales")
-                deterioration_score += W_QUALITY
-
-        # --- PILLAR 3: CAPITAL EFFICIENCY (ROE / ROIC) ---
-        # Are they losing their competitive advantage?
-        if net_inc is not None and equity is not None:
-            try:
-                # Align dates
-                common = net_inc.index.intersection(equity.index)
-                if len(common) >= 3:
-                    roe_latest = net_inc[common[0]] / equity[common[0]]
-                    roe_prev = net_inc[common[1]] / equity[common[1]]
-                    roe_old = net_inc[common[2]] / equity[common[2]]
-                    
-                    if roe_latest < roe_prev and roe_prev < roe_old:
-                        drivers.append("Moat Erosion: ROE has declined for 3 consecutive years")
-                        deterioration_score += W_QUALITY
-            except: pass
-
-        # --- PILLAR 4: SOLVENCY & SAFETY ---
-        if not is_financial:
-            # Interest Coverage
-            if op_inc is not None and int_exp is not None:
-                curr_op = op_inc.iloc[0]
-                curr_int = abs(int_exp.iloc[0])
-                if curr_int > 0:
-                    cov = curr_op / curr_int
-                    if cov < 1.5:
-                        drivers.append(f"Critical Solvency Risk: Interest Coverage {round(cov,1)}x")
-                        deterioration_score += W_SOLVENCY
-            
-            # Dilution Check (Are they selling shares to survive?)
-            if shares is not None and len(shares) >= 2:
-                if shares.iloc[0] > (shares.iloc[1] * 1.05): # >5% dilution
-                    drivers.append("Shareholder Dilution: Share count increased >5%")
-                    deterioration_score += W_DILUTION
-        else:
-            # Financials: Check Book Value Erosion
-            if evaluate_trend_structure(equity) == "Deteriorating":
-                drivers.append("Capital Erosion: Book Value declining")
-                deterioration_score += W_SOLVENCY
-
-        # --- FINAL VERDICT ---
-        if deterioration_score >= 3.0:
-            status = "Broken"
-        elif deterioration_score >= 1.0:
-            status = "Weakening"
+            flags[i, _FLAGS.index("RECEIVABLES")] = rev_growth > 0 and rec_growth > (rev_growth * 1.5)
+
+    # --- PILLAR 4: SOLVENCY & SAFETY (non-financials) ---
+    # Newest values sit in column 0; NaN where a statement row is missing
+    op_inc = stack_recent_values([m["op_inc"] for _, m in analyzed], depth=1)
+    int_exp = stack_recent_values([m["int_exp"] for _, m in analyzed], depth=1)
+    shares = stack_recent_values([m["shares"] for _, m in analyzed], depth=2)
+
+    coverage, critical_coverage, diluted = _solvency_kernel(op_inc[:, 0], int_exp[:, 0], shares[:, 0], shares[:, 1])
+    flags[:, _FLAGS.index("COVERAGE")] = critical_coverage & ~is_financial
+    flags[:, _FLAGS.index("DILUTION")] = diluted & ~is_financial
+
+    # --- FINAL VERDICT ---
+    scores = flags @ _FLAG_WEIGHTS
+    buckets = np.searchsorted(_STATUS_EDGES, scores, side="right")
+
+    for i, (symbol, _) in enumerate(analyzed):
+        # Drivers are only rendered once the verdict is known; Intact needs no explanation
+        if buckets[i]:
+            drivers = [
+                _DRIVERS[key].format(round(coverage[i], 1)) if key == "COVERAGE" else _DRIVERS[key]
+                for key in compress(_FLAGS, flags[i])
+            ]
         else:
-            status = "Intact"
-            
+            drivers = []
         thesis_output[symbol] = {
-            "status": status,
+            "status": _STATUSES[buckets[i]],
             "drivers": drivers,
-            "sector": sector,
-            "score": round(deterioration_score, 1)
+            "sector": sectors[i],
+            "score": round(float(scores[i]), 1)
         }
 
+    if as_frame:
+        # Columnar view with a fixed schema, even when no holding reached scoring
+        frame = pd.DataFrame.from_dict(thesis_output, orient="index").reindex(columns=["status", "drivers", "sector", "score"])
+        frame.index.name = "symbol"
+        frame["sector"] = pd.Categorical(frame.index.map(SECTOR_MAP).fillna("Unknown"))
+        frame["score"] = frame["score"].fillna(0.0).astype(np.float32)
+        return frame
+
     return thesis_output
\ No newline at end of file
@@ -1,167 +1,174 @@
 import numpy as np
 import pandas as pd
-from utils.constants import SECTOR_MAP, SECTOR_CAPTAINS, FALLBACK_SECTOR_PE
-
-def run_valuation_engine(df, market_data):
+from collections import defaultdict
+from functools import lru_cache
+from utils.constants import SECTOR_MAP, SECTOR_CAPTAINS, SECTOR_CODE, FALLBACK_PE_LUT
+
+# Valuation tiers, indexed by the status code assigned in Phase 2
+# (status, stress_score, reason template)
+VALUATION_TIERS = (
+    ("Insufficient Data", 0, "Missing {metric} data"),
+    # --- TIER 1: Undervalued ---
+    ("Undervalued", 30, "Trading at discount to {source} ({metric} {value} vs {benchmark})"),
+    # --- TIER 2: Fair Value ---
+    ("Fair Value", 50, "Aligned with {source}"),
+    # --- TIER 3: Expensive (Requires Growth Defense) ---
+    ("Justified Premium", 60, "Premium valuations supported by growth (PEG {peg})"), # Elevated but not critical
+    ("Highly Stretched", 90, "Significantly detached from {source} without PEG support"),
+    ("Overvalued", 75, "Expensive relative to {source}"),
+    ("Premium", 65, "Trading at premium to peers"),
+)
+
+# Per-holding fields, in output order (as_frame column schema)
+VALUATION_COLUMNS = [
+    "valuation_status", "stress_score", "primary_metric", "primary_value",
+    "benchmark_value", "benchmark_source", "peg_ratio", "reason",
+]
+
+def _median(values: list) -> float:
+    """Median of a short list of captain multiples (float32 is ample for P/E, P/B precision)."""
+    return float(np.median(np.fromiter(values, dtype=np.float32, count=len(values))))
+
+def run_valuation_engine(df, market_data, as_frame: bool = False):
     """
     Computes valuation stretch using Dynamic Sector Benchmarking.
     OPTIMIZED: Pre-calculates sector benchmarks to avoid redundant lookups.
+    as_frame=True returns a symbol-indexed DataFrame instead of the dict of dicts;
+    non-equity rows leave the equity-only columns NaN and also carry a sector.
     """
 
-    valuation_output = {}
+    # Resolve every holding's sector once (categorical: one string per sector)
+    sector_col = df["symbol"].map(SECTOR_MAP).fillna("Unknown").astype("category")
+
+    @lru_cache(maxsize=None)
+    def captain_info(cap_symbol: str) -> dict:
+        # Handle suffix safety (try both raw and .NS)
+        return market_data.get_info(cap_symbol) or market_data.get_info(f"{cap_symbol}.NS") or {}
 
     # --- PHASE 1: PRE-CALCULATE SECTOR BENCHMARKS ---
     # Identify all unique sectors in the user's portfolio first
-    unique_sectors = set()
-    for sym in df["symbol"]:
-        unique_sectors.add(SECTOR_MAP.get(sym, "Unknown"))
+    unique_sectors = sector_col.cat.categories
 
-    # Cache benchmarks for these sectors to avoid re-calculating inside the main loop
-    sector_benchmarks_cache = {}
+    # Gather live captain multiples for these sectors in a single pass
+    sector_pe = defaultdict(list)
+    sector_pb = defaultdict(list)
 
     for sector in unique_sectors:
-        # 1. Identify Captains
-        captains = SECTOR_CAPTAINS.get(sector, [])
-        pe_values = []
-        pb_values = []
-
-        # 2. Fetch Captain Data (Once per sector)
-        for cap_symbol in captains:
-            # Handle suffix safety (try both raw and .NS)
-            info = market_data.get_info(cap_symbol)
-            if not info:
-                # Fallback to appending .NS if the raw symbol didn't return info
-                info = market_data.get_info(f"{cap_symbol}.NS")
-            
+        # 1. Identify Captains & Fetch their Data (Once per sector)
+        for cap_symbol in SECTOR_CAPTAINS.get(sector, []):
+            info = captain_info(cap_symbol)
             if info:
                 pe = info.get("trailingPE")
                 pb = info.get("priceToBook")
                 # Filter out None and negative values (unprofitable companies shouldn't set the PE bar)
-                if pe and pe > 0: pe_values.append(pe)
-                if pb and pb > 0: pb_values.append(pb)
-        
-        # 3. Compute Medians or Fallbacks
-        # PE Benchmark Calculation
-        if pe_values:
-            bench_pe = np.median(pe_values)
-            source_pe = "Live Sector Captains"
-        else:
-            bench_pe = FALLBACK_SECTOR_PE.get(sector, 20.0)
-            source_pe = "Static Market Baseline"
-
-        # PB Benchmark Calculation (Default fallback 3.0 if no captains)
-        if pb_values:
-            bench_pb = np.median(pb_values)
-            source_pb = "Live Sector Captains"
-        else:
-            bench_pb = 3.0
-            source_pb = "Static Market Baseline"
-
-        sector_benchmarks_cache[sector] = {
-            "pe": (bench_pe, source_pe),
-            "pb": (bench_pb, source_pb)
-        }
+                if pe and pe > 0: sector_pe[sector].append(pe)
+                if pb and pb > 0: sector_pb[sector].append(pb)
+
+    # 2. Compute Medians (sectors without live captains fall back below)
+    sector_median_pe = {sector: _median(v) for sector, v in sector_pe.items()}
+    sector_median_pb = {sector: _median(v) for sector, v in sector_pb.items()}
+
+    # 3. Benchmarks as parallel arrays indexed by sector code (sector_col.cat.codes)
+    # PE falls back to the static baseline, gathered from the sector-code LUT
+    fallback_pe = FALLBACK_PE_LUT[np.array([SECTOR_CODE[s] for s in unique_sectors], dtype=np.intp)]
+    live_pe = np.array([sector_median_pe.get(s, np.nan) for s in unique_sectors], dtype=float)
+    bench_pe = np.where(np.isnan(live_pe), fallback_pe, live_pe)
+    # PB falls back to 3.0 if no captains
+    bench_pb = np.array([sector_median_pb.get(s, 3.0) for s in unique_sectors], dtype=float)
+    source_pe = np.where(unique_sectors.isin(list(sector_median_pe)), "Live Sector Captains", "Static Market Baseline").astype(object)
+    source_pb = np.where(unique_sectors.isin(list(sector_median_pb)), "Live Sector Captains", "Static Market Baseline").astype(object)
 
     # --- PHASE 2: EVALUATE HOLDINGS ---
-    # Now we iterate through the portfolio. Since benchmarks are cached, this is fast.
-    
-    for _, row in df.iterrows():
-        symbol = row["symbol"]
-        
-        # 1. Skip Non-Equity
-        if row.get("instrument_type", "Equity") != "Equity":
-            valuation_output[symbol] = {
-                "valuation_status": "Not Applicable",
-                "stress_score": 0,
-                "reason": "Non-equity instrument"
-            }
-            continue
-
-        # 2. Get Stock Data
-        info = market_data.get_info(symbol)
-        sector = SECTOR_MAP.get(symbol, "Unknown")
-        
-        # Defensively get metrics
-        pe = info.get("trailingPE")
-        pb = info.get("priceToBook")
-        peg = info.get("pegRatio")
-        
-        # 3. Determine Primary Metric (Financials vs Others)
-        is_financial = (sector == "Financials")
-        
-        if is_financial:
-            primary_val = pb
-            metric_name = "P/B"
-            # Retrieve cached benchmark
-            benchmark_val, benchmark_source = sector_benchmarks_cache.get(sector, {}).get("pb", (3.0, "Fallback"))
-        else:
-            primary_val = pe
-            metric_name = "P/E"
-            # Retrieve cached benchmark
-            benchmark_val, benchmark_source = sector_benchmarks_cache.get(sector, {}).get("pe", (20.0, "Fallback"))
-
-        # 4. Logic Gates
-        status = "Unknown"
-        stress_score = 50
-        reason = ""
-
-        # A. Missing Data Check
-        if primary_val is None:
-            status = "Insufficient Data"
-            stress_score = 0
-            reason = f"Missing {metric_name} data"
-        
-        # B. Valid Data Analysis
-        else:
-            # Calculate Premium/Discount
-            ratio = primary_val / benchmark_val if benchmark_val else 1.0
-            
-            # --- TIER 1: Undervalued ---
-            if ratio < 0.75: # >25% discount
-                status = "Undervalued"
-                stress_score = 30
-                reason = f"Trading at discount to {benchmark_source} ({metric_name} {round(primary_val,1)} vs {round(benchmark_val,1)})"
-
-            # --- TIER 2: Fair Value ---
-            elif 0.75 <= ratio <= 1.25:
-                status = "Fair Value"
-                stress_score = 50
-                reason = f"Aligned with {benchmark_source}"
-
-            # --- TIER 3: Expensive (Requires Growth Defense) ---
-            else:
-                # Check PEG Ratio (The "Growth Defense")
-                # PEG < 1.5 is generally acceptable for high growth
-                is_growth_justified = (peg is not None and 0 < peg < 1.5)
-                
-                if is_growth_justified:
-                    status = "Justified Premium"
-                    stress_score = 60 # Elevated but not critical
-                    reason = f"Premium valuations supported by growth (PEG {peg})"
-                else:
-                    if ratio > 2.5: # Extreme disconnect
-                        status = "Highly Stretched"
-                        stress_score = 90
-                        reason = f"Significantly detached from {benchmark_source} without PEG support"
-                    elif ratio > 1.5:
-                        status = "Overvalued"
-                        stress_score = 75
-                        reason = f"Expensive relative to {benchmark_source}"
-                    else:
-                        status = "Premium"
-                        stress_score = 65
-                        reason = f"Trading at premium to peers"
-
-        # 5. Final Output Construction
-        valuation_output[symbol] = {
+    # Metrics for every equity holding are gathered into arrays and classified in one pass.
+    equity_mask = (df["instrument_type"] == "Equity").to_numpy()
+    equities = df["symbol"][equity_mask].tolist()
+    codes = sector_col.cat.codes.to_numpy()[equity_mask]
+
+    infos = [market_data.get_info(sym) for sym in equities]
+
+    # Defensively get metrics
+    pe = [info.get("trailingPE") for info in infos]
+    pb = [info.get("priceToBook") for info in infos]
+    peg = [info.get("pegRatio") for info in infos]
+
+    pe_arr = np.array(pe, dtype=float) # None -> NaN
+    pb_arr = np.array(pb, dtype=float)
+    peg_arr = np.array(peg, dtype=float)
+
+    # Primary Metric: P/B for Financials, P/E for everyone else (selected by mask, not per row)
+    is_financial = (sector_col == "Financials").to_numpy()[equity_mask]
+    metric_names = np.where(is_financial, "P/B", "P/E").astype(object)
+    primary = np.where(is_financial, pb_arr, pe_arr)
+    primary_vals = [None if np.isnan(val) else val for val in primary.tolist()]
+
+    # One gather per benchmark table instead of per-ticker cache lookups
+    bench = np.where(is_financial, bench_pb[codes], bench_pe[codes])
+    bench_sources = np.where(is_financial, source_pb[codes], source_pe[codes])
+
+    # Calculate Premium/Discount
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(bench != 0, primary / bench, 1.0)
+
+    # Logic Gates (first match wins, codes index VALUATION_TIERS)
+    # PEG < 1.5 is generally acceptable for high growth (the "Growth Defense")
+    status_codes = np.select(
+        [
+            np.isnan(primary),          # A. Missing Data
+            ratio < 0.75,               # >25% discount
+            ratio <= 1.25,              # within +/-25%
+            (peg_arr > 0) & (peg_arr < 1.5),
+            ratio > 2.5,                # Extreme disconnect
+            ratio > 1.5,
+        ],
+        [0, 1, 2, 3, 4, 5],
+        default=6
+    )
+
+    bench_vals = bench.tolist()
+
+    equity_results = {}
+    for i, sym in enumerate(equities):
+        status, stress_score, template = VALUATION_TIERS[status_codes[i]]
+        benchmark_val, benchmark_source = bench_vals[i], bench_sources[i]
+        primary_val = primary_vals[i]
+
+        reason = template.format(
+            metric=metric_names[i],
+            source=benchmark_source,
+            value=round(primary_val, 1) if primary_val is not None else None,
+            benchmark=round(benchmark_val, 1),
+            peg=peg[i]
+        )
+
+        equity_results[sym] = {
             "valuation_status": status,
             "stress_score": stress_score,
-            "primary_metric": metric_name,
+            "primary_metric": metric_names[i],
             "primary_value": primary_val,
             "benchmark_value": round(benchmark_val, 2) if benchmark_val else None,
             "benchmark_source": benchmark_source,
-            "peg_ratio": peg,
+            "peg_ratio": peg[i],
             "reason": reason
         }
 
+    # Final Output Construction (portfolio order)
+    valuation_output = {}
+    for symbol in df["symbol"]:
+        if symbol in equity_results:
+            valuation_output[symbol] = equity_results[symbol]
+        else:
+            valuation_output[symbol] = {
+                "valuation_status": "Not Applicable",
+                "stress_score": 0,
+                "reason": "Non-equity instrument"
+            }
+
+    if as_frame:
+        # Columnar view with a fixed schema, even for a portfolio without equities
+        frame = pd.DataFrame.from_dict(valuation_output, orient="index").reindex(columns=VALUATION_COLUMNS)
+        frame.index.name = "symbol"
+        frame["stress_score"] = frame["stress_score"].astype(np.int16)
+        frame["sector"] = pd.Categorical(frame.index.map(SECTOR_MAP).fillna("Unknown"))
+        return frame
+
     return valuation_output
\ No newline at end of file
@@ -1,8 +1,13 @@
+from collections import Counter
 from datetime import datetime
 import hashlib
+import json
+import logging
 import numpy as np
 import pandas as pd
 
+log = logging.getLogger(__name__)
+
 # --- SCORING WEIGHTS ---
 W_FUNDAMENTAL = 0.40  # Thesis strength is paramount
 W_EFFICIENCY  = 0.30  # Opportunity cost / ROE
@@ -12,74 +17,75 @@ W_RISK        = 0.10  # Volatility profile
 def _hash_dataframe(df) -> str:
     """Creates a stable fingerprint of holdings for auditability."""
     try:
-        csv_bytes = df.to_csv(index=False).encode()
-        return hashlib.sha256(csv_bytes).hexdigest()
+        digest = hashlib.sha256()
+        # Schema first: row hashes alone ignore column names and dtypes
+        digest.update("|".join(f"{col}:{dtype}" for col, dtype in df.dtypes.items()).encode())
+        # Per-row uint64 hashes; binary, no text formatting of the values
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
     except:
         return "hash_error"
 
-def _sanitize(obj):
+def _json_default(obj):
     """
-    Recursively converts numpy/pandas types to native Python types.
-    Ensures JSON serializability for the frontend/API.
+    json hook for the types the stdlib encoder can't handle (numpy/pandas scalars).
+    Anything else unknown degrades to its string form.
     """
-    if isinstance(obj, (np.integer, int)):
+    if isinstance(obj, np.integer):
         return int(obj)
-    elif isinstance(obj, (np.floating, float)):
+    elif isinstance(obj, np.floating):
         return float(obj)
-    elif isinstance(obj, (np.ndarray,)):
+    elif isinstance(obj, np.ndarray):
         return obj.tolist()
     elif isinstance(obj, pd.Timestamp):
         return obj.isoformat()
-    elif isinstance(obj, dict):
-        return {k: _sanitize(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [_sanitize(v) for v in obj]
-    elif obj is None:
-        return None
     return str(obj)
 
+def _sanitize(obj):
+    """
+    Converts numpy/pandas types to native Python types.
+    Ensures JSON serializability for the frontend/API.
+    One C-level encode/decode pass instead of a recursive Python walk.
+    """
+    return json.loads(json.dumps(obj, default=_json_default))
+
 def calculate_premium_health_score(df, thesis_data, opportunity_data, valuation_data):
     """
     Computes a sophisticated 'Portfolio Quality Score' (0-100).
     """
-    total_score = 0.0
-    total_weight = 0.0
-
-    for _, row in df.iterrows():
-        sym = row.get("symbol")
-        if row.get("instrument_type") != "Equity":
-            continue
-            
-        w = row.get("weight_pct", 0)
-        
-        # 1. Fundamental Score (Thesis)
-        # Intact=100, Weakening=50, Broken=0
-        t_status = thesis_data.get(sym, {}).get("status", "Unknown")
-        score_fund = 100 if t_status == "Intact" else (50 if t_status == "Weakening" else 0)
-
-        # 2. Efficiency Score (Opportunity Cost)
-        # Derived from Capital Drag (Lower drag = Higher efficiency)
-        drag = opportunity_data.get(sym, {}).get("capital_drag_score", 50)
-        score_eff = max(0, 100 - drag)
-
-        # 3. Valuation Score
-        # Derived from Stress Score (Lower stress = Higher comfort)
-        stress = valuation_data.get(sym, {}).get("stress_score", 50)
-        score_val = max(0, 100 - stress)
-
-        # 4. Composite Holding Score
-        holding_score = (
-            (score_fund * W_FUNDAMENTAL) + 
-            (score_eff * W_EFFICIENCY) + 
-            (score_val * W_VALUATION) + 
-            (50 * W_RISK) # Risk is neutral at holding level, managed at portfolio level
-        )
-        
-        total_score += (holding_score * w)
-        total_weight += w
+    equity = (df["instrument_type"] == "Equity").to_numpy()
+    symbols = df["symbol"].to_numpy()[equity]
+    weights = df["weight_pct"].to_numpy(dtype=float)[equity]
 
+    total_weight = weights.sum()
     if total_weight == 0: return 0
-    return int(round(total_score / total_weight))
+
+    # Engine lookups materialized once into arrays aligned with `weights`
+    t_status = np.array([thesis_data.get(sym, {}).get("status", "Unknown") for sym in symbols], dtype=object)
+    drag = np.fromiter((opportunity_data.get(sym, {}).get("capital_drag_score", 50) for sym in symbols), dtype=float, count=len(symbols))
+    stress = np.fromiter((valuation_data.get(sym, {}).get("stress_score", 50) for sym in symbols), dtype=float, count=len(symbols))
+
+    # 1. Fundamental Score (Thesis)
+    # Intact=100, Weakening=50, Broken=0
+    score_fund = np.select([t_status == "Intact", t_status == "Weakening"], [100.0, 50.0], default=0.0)
+
+    # 2. Efficiency Score (Opportunity Cost)
+    # Derived from Capital Drag (Lower drag = Higher efficiency)
+    score_eff = np.maximum(0, 100 - drag)
+
+    # 3. Valuation Score
+    # Derived from Stress Score (Lower stress = Higher comfort)
+    score_val = np.maximum(0, 100 - stress)
+
+    # 4. Composite Holding Score
+    holding_score = (
+        (score_fund * W_FUNDAMENTAL) + 
+        (score_eff * W_EFFICIENCY) + 
+        (score_val * W_VALUATION) + 
+        (50 * W_RISK) # Risk is neutral at holding level, managed at portfolio level
+    )
+
+    return int(round(np.dot(holding_score, weights) / total_weight))
 
 def assemble_output(
     df,
@@ -99,6 +105,7 @@ def assemble_output(
     # 1. METADATA & SCORING
     # =========================
     run_id = datetime.utcnow().isoformat()
+
     health_score = calculate_premium_health_score(df, thesis_data, opportunity_data, valuation_data)
 
     # =========================
@@ -114,10 +121,8 @@ def assemble_output(
         
         # Action Counts
         actions = decision_data.get("portfolio_actions", {}).get("actions", [])
-        action_counts = {"EXIT": 0, "TRIM": 0, "REPLACE": 0}
-        for a in actions:
-            if a["action"] in action_counts:
-                action_counts[a["action"]] += 1
+        counts = Counter(a["action"] for a in actions)
+        action_counts = {k: counts.get(k, 0) for k in ("EXIT", "TRIM", "REPLACE")}
 
         portfolio_summary = {
             "total_value": total_value,
@@ -143,36 +148,49 @@ def assemble_output(
             "critical_flags": conc.get("flags", []) + risk_data.get("sector_exposure", {}).get("flags", [])
         }
     except Exception as e:
-        print(f"Assembly Error (Summary): {e}")
+        log.warning("Assembly Error (Summary): %s", e)
         portfolio_summary = {"error": "Failed to generate summary"}
 
     # =========================
     # 3. DETAILED HOLDINGS ANALYSIS
     # =========================
-    holdings_analysis = []
-
-    for _, row in df.iterrows():
-        sym = row.get("symbol")
-        
+    holdings_analysis = [None] * len(df) # one slot per row; trimmed after skips
+    write_idx = 0
+
+    # Loop-invariant lookups
+    holding_risk = risk_data.get("holding_risk", {})
+    holding_actions = decision_data.get("holding_actions", {})
+
+    # Pull the columns once; zip avoids building a Series per row.
+    # Numeric columns are cast to float up front so every block holds native Python values.
+    holding_rows = zip(
+        df["symbol"].tolist(),
+        df["instrument_type"].tolist(),
+        df["weight_pct"].astype(float).tolist(),
+        df["ltp"].astype(float).tolist(),
+        df["current_value"].astype(float).tolist(),
+    )
+
+    for sym, instrument_type, weight_pct, ltp, current_value in holding_rows:
         # Support Non-Equity (SGB, ETFs) gently
-        is_equity = row.get("instrument_type") == "Equity"
+        is_equity = instrument_type == "Equity"
         
         try:
             # Null-Safe Extractors
             t_dat = thesis_data.get(sym, {})
             v_dat = valuation_data.get(sym, {})
             o_dat = opportunity_data.get(sym, {})
-            r_dat = risk_data.get("holding_risk", {}).get(sym, {})
-            d_dat = decision_data.get("holding_actions", {}).get(sym, {})
+            r_dat = holding_risk.get(sym, {})
+            d_dat = holding_actions.get(sym, {})
 
             holding_block = {
                 "symbol": sym,
-                "type": row.get("instrument_type"),
+                "type": instrument_type,
                 "meta": {
                     "sector": t_dat.get("sector", "N/A"),
-                    "weight_pct": round(row.get("weight_pct", 0), 2),
-                    "current_price": row.get("ltp", 0),
-                    "invested_val": row.get("current_value", 0)
+                    "weight_pct": round(weight_pct, 2),
+                    "current_price": ltp,
+                    "invested_val": current_value
                 },
                 # Only populate deep analytics for Equity
                 "analytics": {
@@ -189,12 +207,15 @@ def assemble_output(
                     "alternatives": o_dat.get("replacement_candidates")
                 }
             }
-            holdings_analysis.append(holding_block)
+            holdings_analysis[write_idx] = holding_block
+            write_idx += 1
 
         except Exception as e:
-            print(f"Skipping {sym}: {e}")
+            log.warning("Skipping %s: %s", sym, e)
             continue
 
+    del holdings_analysis[write_idx:]
+
     # =========================
     # 4. FINAL PACKAGE
     # =========================
@@ -1,12 +1,105 @@
 from utils.constants import MAX_PORTFOLIO_ACTIONS
 from collections import defaultdict
+import heapq
+import sys
+import numpy as np
 
 # --- CONFIGURATION ---
 # Urgency Levels
-URGENCY_CRITICAL = "Critical"  # Immediate Action (Fraud, Thesis Break)
-URGENCY_HIGH     = "High"      # Strategic Reallocation (Dead Money)
-URGENCY_MEDIUM   = "Medium"    # Risk Control (Trimming)
-URGENCY_LOW      = "Low"       # Maintenance
+# Labels are interned so the repeated equality checks / dict lookups downstream hit the identity fast path
+URGENCY_CRITICAL = sys.intern("Critical")  # Immediate Action (Fraud, Thesis Break)
+URGENCY_HIGH     = sys.intern("High")      # Strategic Reallocation (Dead Money)
+URGENCY_MEDIUM   = sys.intern("Medium")    # Risk Control (Trimming)
+URGENCY_LOW      = sys.intern("Low")       # Maintenance
+
+# Actions
+ACTION_EXIT    = sys.intern("EXIT")
+ACTION_REPLACE = sys.intern("REPLACE")
+ACTION_TRIM    = sys.intern("TRIM")
+ACTION_WATCH   = sys.intern("WATCH")
+ACTION_HOLD    = sys.intern("HOLD")
+
+# Prioritization: base score per action, scaled by urgency
+ACTION_SCORES = {
+    ACTION_EXIT: 100,
+    ACTION_REPLACE: 80,
+    ACTION_TRIM: 60,
+    ACTION_WATCH: 10,
+    ACTION_HOLD: 0
+}
+
+URGENCY_MULTIPLIER = {
+    URGENCY_CRITICAL: 2.0,
+    URGENCY_HIGH: 1.5,
+    URGENCY_MEDIUM: 1.0,
+    URGENCY_LOW: 0.5
+}
+
+# Signal thresholds
+STRESS_HIGH     = 75   # Premium valuation (WATCH)
+STRESS_EXTREME  = 90   # Extreme Overvaluation
+DRAG_CRITICAL   = 85   # Dead Capital
+
+# --- DECISION MATRIX ---
+# Bucketed signals: (veto event, thesis, risk tag, dead capital, has replacement, valuation, momentum)
+VETO_IMPACTS = ("Governance Risk", "Regulatory Hit")
+THESIS_CODES = {"Intact": 0, "Weakening": 1, "Broken": 2}               # anything else -> 3
+RISK_CODES = {"Critical (Liquidity)": 1, "Critical (Volatility)": 2}    # anything else -> 0
+# valuation: 0 (<75), 1 (75-89), 2 (>=90)  |  momentum: 0 (<40), 1 (40-60), 2 (60-75], 3 (>75)
+DECISION_SHAPE = (2, 4, 3, 2, 2, 3, 4)
+
+def _decide(veto, thesis, risk, dead_capital, has_replacement, val_bucket, mom_bucket) -> tuple:
+    """
+    THE DECISION HIERARCHY (The "Brain") over bucketed signals.
+    Returns: (action, reason template, urgency)
+    """
+    # --- PRIORITY 1: EVENT RISKS (The Veto Layer) ---
+    # Governance Fraud / Regulatory Bans trigger immediate exit regardless of price.
+    if veto:
+        return ACTION_EXIT, "CRITICAL EVENT: {headline} ({impact})", URGENCY_CRITICAL
+
+    # --- PRIORITY 2: THESIS FAILURE ---
+    if thesis == 2:
+        return ACTION_EXIT, "Thesis Broken: Structural deterioration in fundamentals.", URGENCY_CRITICAL
+
+    # --- PRIORITY 3: RISK BREACHES ---
+    if risk == 1:
+        return ACTION_TRIM, "Liquidity Trap: Position size dangerous for Small Cap volume.", URGENCY_HIGH
+
+    if risk == 2:
+        # Nuance: If Momentum is Strong, we Trim. If Weak, we Exit.
+        if mom_bucket >= 2:
+            return ACTION_TRIM, "Risk Control: Trimming overweight position in volatile stock.", URGENCY_MEDIUM
+        return ACTION_EXIT, "Volatility Risk: High Beta without momentum support.", URGENCY_HIGH
+
+    # --- PRIORITY 4: CAPITAL EFFICIENCY (Dead Money) ---
+    if dead_capital:
+        # Check if we have a replacement ready
+        if has_replacement:
+            return ACTION_REPLACE, "Dead Capital: Switch to {alt_sym} for better ROE/Efficiency.", URGENCY_HIGH
+        return ACTION_EXIT, "Dead Capital: Stock is efficiently dragging portfolio performance.", URGENCY_MEDIUM
+
+    # --- PRIORITY 5: VALUATION & MOMENTUM (The "Trade" Layer) ---
+    if val_bucket == 2: # Extreme Overvaluation
+        if mom_bucket == 3:
+            # "Ride the Bubble" but take chips off table
+            return ACTION_TRIM, "Profit Booking: Valuation stretched, but momentum is strong. Trim to lock gains.", URGENCY_MEDIUM
+        # Bubble Bursting
+        return ACTION_EXIT, "Valuation Bubble: Price disconnected from reality with fading momentum.", URGENCY_HIGH
+
+    if thesis == 1 and mom_bucket == 0:
+        return ACTION_EXIT, "Falling Knife: Weakening fundamentals + Downtrend.", URGENCY_HIGH
+
+    if val_bucket >= 1 and thesis == 0:
+        return ACTION_WATCH, "Monitor: Premium valuation, but quality is intact.", URGENCY_LOW
+
+    # Default State
+    return ACTION_HOLD, "Thesis intact, metrics within tolerance.", URGENCY_LOW
+
+# Every bucket combination resolved once at import, indexed by np.ravel_multi_index(..., DECISION_SHAPE)
+DECISION_TABLE = [_decide(*signal) for signal in np.ndindex(DECISION_SHAPE)]
+# Columnar copies: a whole portfolio resolves with one np.take per column
+DECISION_ACTIONS, DECISION_REASONS, DECISION_URGENCY = (np.array(col, dtype=object) for col in zip(*DECISION_TABLE))
 
 def _index_events(event_list: list) -> dict:
     """
@@ -14,15 +107,12 @@ def _index_events(event_list: list) -> dict:
     Prioritizes the most negative event if multiple exist.
     """
     if not event_list: return {}
-    
-    event_map = {}
-    for e in event_list:
-        sym = e["symbol"]
-        # If we already have a Critical event for this symbol, don't overwrite with a minor one
-        if sym in event_map and event_map[sym]["impact"] == "Governance Risk":
-            continue
-        event_map[sym] = e
-    return event_map
+
+    # Last write wins: routine events in arrival order, then Critical (Governance) events
+    # reversed so the first one seen for a symbol is never overwritten by a minor one
+    routine = [e for e in event_list if e["impact"] != "Governance Risk"]
+    critical = [e for e in event_list if e["impact"] == "Governance Risk"]
+    return {e["symbol"]: e for e in routine + critical[::-1]}
 
 def run_decision_engine(
     df,
@@ -41,152 +131,95 @@ def run_decision_engine(
     # 1. Validation
     if not isinstance(risk_data, dict): raise ValueError("risk_data must be dict")
     
-    holding_actions = {}
     portfolio_actions = []
     
     # 2. Index Events for fast lookup
     events_map = _index_events(event_data)
 
-    # 3. Evaluation Loop
-    for _, row in df.iterrows():
-        symbol = row.get("symbol")
-        if not symbol: continue
-        
-        # A. Default State
-        action = "HOLD"
-        reason = "Thesis intact, metrics within tolerance."
-        urgency = URGENCY_LOW
-        
-        # B. Skip Non-Equity
-        if row.get("instrument_type") != "Equity":
-            holding_actions[symbol] = {"action": "HOLD", "reason": "Asset Class: Non-Equity", "urgency": "Low"}
-            continue
-
-        # C. Gather Intelligence
-        thesis = thesis_data.get(symbol, {})
-        val = valuation_data.get(symbol, {})
-        opp = opportunity_data.get(symbol, {})
-        risk = risk_data.get("holding_risk", {}).get(symbol, {})
-        event = events_map.get(symbol)
-
-        # Extract Signals
-        thesis_status = thesis.get("status", "Unknown")           
-        val_stress = val.get("stress_score", 50)                  
-        drag_score = opp.get("capital_drag_score", 0)             
-        mom_score = opp.get("momentum_health", 50) # New from Opportunity Engine
-        risk_tag = risk.get("risk_tag", "Low")
-        
-        # D. THE DECISION HIERARCHY (The "Brain")
-        
-        # --- PRIORITY 1: EVENT RISKS (The Veto Layer) ---
-        # Governance Fraud / Regulatory Bans trigger immediate exit regardless of price.
-        if event and event["impact"] in ["Governance Risk", "Regulatory Hit"]:
-            action = "EXIT"
-            reason = f"CRITICAL EVENT: {event['headline']} ({event['impact']})"
-            urgency = URGENCY_CRITICAL
-
-        # --- PRIORITY 2: THESIS FAILURE ---
-        elif thesis_status == "Broken":
-            action = "EXIT"
-            reason = "Thesis Broken: Structural deterioration in fundamentals."
-            urgency = URGENCY_CRITICAL
-
-        # --- PRIORITY 3: RISK BREACHES ---
-        elif risk_tag == "Critical (Liquidity)":
-            action = "TRIM"
-            reason = "Liquidity Trap: Position size dangerous for Small Cap volume."
-            urgency = URGENCY_HIGH
-            
-        elif risk_tag == "Critical (Volatility)":
-            # Nuance: If Momentum is Strong, we Trim. If Weak, we Exit.
-            if mom_score > 60:
-                action = "TRIM"
-                reason = "Risk Control: Trimming overweight position in volatile stock."
-                urgency = URGENCY_MEDIUM
-            else:
-                action = "EXIT"
-                reason = "Volatility Risk: High Beta without momentum support."
-                urgency = URGENCY_HIGH
-
-        # --- PRIORITY 4: CAPITAL EFFICIENCY (Dead Money) ---
-        elif drag_score >= 85:
-            # Check if we have a replacement ready
-            candidates = opp.get("replacement_candidates")
-            if candidates:
-                action = "REPLACE"
-                alt_sym = candidates["candidates"][0]["symbol"]
-                reason = f"Dead Capital: Switch to {alt_sym} for better ROE/Efficiency."
-                urgency = URGENCY_HIGH
-            else:
-                action = "EXIT"
-                reason = "Dead Capital: Stock is efficiently dragging portfolio performance."
-                urgency = URGENCY_MEDIUM
-
-        # --- PRIORITY 5: VALUATION & MOMENTUM (The "Trade" Layer) ---
-        elif val_stress >= 90: # Extreme Overvaluation
-            if mom_score > 75:
-                # "Ride the Bubble" but take chips off table
-                action = "TRIM"
-                reason = "Profit Booking: Valuation stretched, but momentum is strong. Trim to lock gains."
-                urgency = URGENCY_MEDIUM
-            else:
-                # Bubble Bursting
-                action = "EXIT"
-                reason = "Valuation Bubble: Price disconnected from reality with fading momentum."
-                urgency = URGENCY_HIGH
-
-        elif thesis_status == "Weakening" and mom_score < 40:
-            action = "EXIT"
-            reason = "Falling Knife: Weakening fundamentals + Downtrend."
-            urgency = URGENCY_HIGH
-            
-        elif val_stress >= 75 and thesis_status == "Intact":
-             action = "WATCH"
-             reason = "Monitor: Premium valuation, but quality is intact."
-
-        # E. Store Decision
+    # 3. Split Equity / Non-Equity once with a mask instead of testing every row
+    symbols = df["symbol"].to_numpy()
+    eq_mask = (df["instrument_type"] == "Equity").to_numpy()
+
+    holding_actions = dict.fromkeys(sym for sym in symbols if sym) # keeps portfolio order
+    holding_actions.update({
+        sym: {"action": ACTION_HOLD, "reason": "Asset Class: Non-Equity", "urgency": URGENCY_LOW}
+        for sym in symbols[~eq_mask] if sym
+    })
+    equities = [sym for sym in symbols[eq_mask] if sym]
+
+    # Flatten each holding's engine outputs once: one lookup per equity below
+    holding_risk = risk_data.get("holding_risk", {})
+    signals = {
+        sym: (thesis_data.get(sym, {}), valuation_data.get(sym, {}), opportunity_data.get(sym, {}), holding_risk.get(sym, {}))
+        for sym in equities
+    }
+
+    # Extract Signals
+    thesis_status, val_stress, drag_score, mom_score, risk_tag, events, candidates = [], [], [], [], [], [], []
+    for symbol in equities:
+        thesis, val, opp, risk = signals[symbol]
+        thesis_status.append(thesis.get("status", "Unknown"))
+        val_stress.append(val.get("stress_score", 50))
+        drag_score.append(opp.get("capital_drag_score", 0))
+        mom_score.append(opp.get("momentum_health", 50)) # New from Opportunity Engine
+        risk_tag.append(risk.get("risk_tag", "Low"))
+        events.append(events_map.get(symbol))
+        candidates.append(opp.get("replacement_candidates"))
+
+    val_arr = np.array(val_stress, dtype=float)
+    drag_arr = np.array(drag_score, dtype=float)
+    mom_arr = np.array(mom_score, dtype=float)
+
+    # Bucket the signals at the hierarchy's thresholds (NaN lands where the old comparisons sent it)
+    keys = np.ravel_multi_index((
+        np.array([bool(e) and e["impact"] in VETO_IMPACTS for e in events], dtype=int),
+        np.array([THESIS_CODES.get(t, 3) for t in thesis_status], dtype=int),
+        np.array([RISK_CODES.get(r, 0) for r in risk_tag], dtype=int),
+        (drag_arr >= DRAG_CRITICAL).astype(int),
+        np.array([bool(c) for c in candidates], dtype=int),
+        (val_arr >= STRESS_HIGH).astype(int) + (val_arr >= STRESS_EXTREME),
+        (~(mom_arr < 40)).astype(int) + (mom_arr > 60) + (mom_arr > 75),
+    ), DECISION_SHAPE)
+
+    decisions = zip(
+        np.take(DECISION_ACTIONS, keys).tolist(),
+        np.take(DECISION_REASONS, keys).tolist(),
+        np.take(DECISION_URGENCY, keys).tolist(),
+    )
+
+    for i, (symbol, (action, reason, urgency)) in enumerate(zip(equities, decisions)):
+
+        # Fill in the per-holding details the table can't know
+        if action == ACTION_REPLACE:
+            reason = reason.format(alt_sym=candidates[i]["candidates"][0]["symbol"])
+        elif urgency == URGENCY_CRITICAL and events[i] and events[i]["impact"] in VETO_IMPACTS:
+            reason = reason.format(headline=events[i]["headline"], impact=events[i]["impact"])
+
+        # Store Decision
         holding_actions[symbol] = {
             "action": action,
             "reason": reason,
             "urgency": urgency,
             "meta": {
-                "momentum": mom_score,
-                "thesis": thesis_status
+                "momentum": mom_score[i],
+                "thesis": thesis_status[i]
             }
         }
 
     # 4. Portfolio-Level Prioritization
     # We score actions to ensure the "Top 3" displayed are actually the most important
-    
-    action_score_map = {
-        "EXIT": 100,
-        "REPLACE": 80,
-        "TRIM": 60,
-        "WATCH": 10,
-        "HOLD": 0
-    }
-    
-    urgency_multiplier = {
-        URGENCY_CRITICAL: 2.0,
-        URGENCY_HIGH: 1.5,
-        URGENCY_MEDIUM: 1.0,
-        URGENCY_LOW: 0.5
-    }
-
     scored_actions = []
     for sym, data in holding_actions.items():
-        if data["action"] in ["HOLD", "WATCH"]: continue
+        if data["action"] in (ACTION_HOLD, ACTION_WATCH): continue
         
-        base_score = action_score_map.get(data["action"], 0)
-        mult = urgency_multiplier.get(data["urgency"], 1.0)
+        base_score = ACTION_SCORES.get(data["action"], 0)
+        mult = URGENCY_MULTIPLIER.get(data["urgency"], 1.0)
         final_score = base_score * mult
         
         scored_actions.append((sym, data, final_score))
 
-    # Sort by Score Descending
-    scored_actions.sort(key=lambda x: x[2], reverse=True)
-
-    for sym, data, score in scored_actions[:MAX_PORTFOLIO_ACTIONS]:
+    # Top actions by Score Descending (ties keep portfolio order, as a stable sort would)
+    for sym, data, score in heapq.nlargest(MAX_PORTFOLIO_ACTIONS, scored_actions, key=lambda x: x[2]):
         portfolio_actions.append({
             "symbol": sym,
             "action": data["action"],
@@ -197,7 +230,7 @@ def run_decision_engine(
     return {
         "portfolio_actions": {
             "do_nothing": len(portfolio_actions) == 0,
-            "net_action_bias": "De-Risk" if any(a["action"]=="EXIT" for a in portfolio_actions) else "Optimize",
+            "net_action_bias": "De-Risk" if any(a["action"] == ACTION_EXIT for a in portfolio_actions) else "Optimize",
             "actions": portfolio_actions
         },
         "holding_actions": holding_actions
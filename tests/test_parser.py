@@ -0,0 +1,22 @@
+import io
+import unittest
+
+from core.parser import HoldingsParseError, load_and_validate_holdings
+
+
+class LoadAndValidateHoldingsTest(unittest.TestCase):
+
+    def test_missing_columns_message_is_sorted_and_plain(self):
+        csv_file = io.StringIO("Instrument,Qty.\nITC,1\n")
+
+        with self.assertRaises(HoldingsParseError) as ctx:
+            load_and_validate_holdings(csv_file)
+
+        self.assertEqual(
+            str(ctx.exception),
+            "Missing required columns: Avg. cost, Cur. val, Invested, LTP, P&L"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
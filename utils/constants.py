@@ -1,10 +1,18 @@
-REQUIRED_HOLDINGS_COLUMNS = {
+import re
+import sys
+from types import MappingProxyType
+from typing import Final
+
+import numpy as np
+import pandas as pd
+
+REQUIRED_HOLDINGS_COLUMNS = frozenset({
     "symbol",
     "quantity",
     "avg_price"
-}
+})
 
-ZERODHA_COLUMN_MAP = {
+ZERODHA_COLUMN_MAP = MappingProxyType({
     "Instrument": "symbol",
     "Qty.": "quantity",
     "Avg. cost": "avg_price",
@@ -12,61 +20,80 @@ ZERODHA_COLUMN_MAP = {
     "Invested": "invested",
     "Cur. val": "current_value",
     "P&L": "pnl",
-}
+})
 
-REQUIRED_ZERODHA_COLUMNS = set(ZERODHA_COLUMN_MAP.keys())
+REQUIRED_ZERODHA_COLUMNS = frozenset(ZERODHA_COLUMN_MAP.keys())
+
+# Column layouts of a canonical Zerodha export, before and after the rename
+ZERODHA_EXPECTED_ORDER = tuple(ZERODHA_COLUMN_MAP.keys())
+ZERODHA_RENAMED_ORDER = tuple(ZERODHA_COLUMN_MAP.values())
 
 NON_EQUITY_SUFFIXES = ("-GB",)     # Sovereign Gold Bonds
 NON_EQUITY_SERIES = ("-BE",)       # BE category stocks
 
+# Instrument kind keyed by the full "-XX" series suffix (one slice + one dict lookup per symbol)
+_SUFFIX_KIND = MappingProxyType({
+    **{suffix: "SGB" for suffix in NON_EQUITY_SUFFIXES},
+    **{suffix: "Restricted Equity" for suffix in NON_EQUITY_SERIES},
+})
+_SUFFIX_LEN = 3 # every suffix above is "-" plus a two-letter series code
+
 def classify_instrument(symbol: str) -> str:
-    if symbol.endswith(NON_EQUITY_SUFFIXES):
-        return "SGB"
-    if symbol.endswith(NON_EQUITY_SERIES):
-        return "Restricted Equity"
-    return "Equity"
+    if "-" not in symbol: # plain tickers (the common case) never carry a series suffix
+        return "Equity"
+    return _SUFFIX_KIND.get(symbol[-_SUFFIX_LEN:], "Equity")
 
-# utils/constants.py
+# Any known series suffix at the very end of a symbol (\Z, unlike $, won't match before a trailing newline)
+_SUFFIX_RE = re.compile("(" + "|".join(map(re.escape, _SUFFIX_KIND)) + r")\Z")
+
+def classify_instruments(symbols: pd.Series) -> pd.Series:
+    """Column-wise classify_instrument: one compiled-regex pass over the column instead of a Python call per row."""
+    return symbols.str.extract(_SUFFIX_RE, expand=False).map(_SUFFIX_KIND).fillna("Equity")
 
 # Live benchmarks: We fetch these to gauge "Sector Sentiment"
 # UPDATED: Aligned with SECTOR_MAP keys and expanded for granularity
-SECTOR_CAPTAINS = {
+SECTOR_CAPTAINS = MappingProxyType({
     # --- CORE ---
-    "Financials": ["HDFCBANK.NS", "ICICIBANK.NS", "BAJFINANCE.NS"],
-    "IT": ["TCS.NS", "INFY.NS"],
-    "FMCG": ["HINDUNILVR.NS", "ITC.NS", "NESTLEIND.NS"],
-    "Auto": ["MARUTI.NS", "M&M.NS", "TMCV.NS"],
-    "Energy": ["RELIANCE.NS", "ONGC.NS", "COALINDIA.NS"],
-    "Power": ["NTPC.NS", "POWERGRID.NS", "TATAPOWER.NS"],
+    "Financials": ("HDFCBANK.NS", "ICICIBANK.NS", "BAJFINANCE.NS"),
+    "IT": ("TCS.NS", "INFY.NS"),
+    "FMCG": ("HINDUNILVR.NS", "ITC.NS", "NESTLEIND.NS"),
+    "Auto": ("MARUTI.NS", "M&M.NS", "TMCV.NS"),
+    "Energy": ("RELIANCE.NS", "ONGC.NS", "COALINDIA.NS"),
+    "Power": ("NTPC.NS", "POWERGRID.NS", "TATAPOWER.NS"),
     
     # --- INDUSTRIALS & INFRA ---
-    "Defence": ["HAL.NS", "BEL.NS", "MAZDOCK.NS"],
-    "Capital Goods": ["SIEMENS.NS", "ABB.NS", "CUMMINSIND.NS"], # Engineering/Machinery
-    "Infrastructure": ["LT.NS", "ADANIENT.NS"],
-    "Services": ["ADANIPORTS.NS", "INDIGO.NS"], # Logistics/Transport
+    "Defence": ("HAL.NS", "BEL.NS", "MAZDOCK.NS"),
+    "Capital Goods": ("SIEMENS.NS", "ABB.NS", "CUMMINSIND.NS"), # Engineering/Machinery
+    "Infrastructure": ("LT.NS", "ADANIENT.NS"),
+    "Services": ("ADANIPORTS.NS", "INDIGO.NS"), # Logistics/Transport
     
     # --- CONSUMER & RETAIL ---
-    "Retail": ["TRENT.NS", "TITAN.NS", "DMART.NS"],
-    "Hotels": ["INDHOTEL.NS", "EIHOTEL.NS"],
-    "Consumer Durables": ["HAVELLS.NS", "VOLTAS.NS", "DIXON.NS"], # Electronics/Appliances
-    "Auto Components": ["MOTHERSON.NS", "BOSCHLTD.NS"],
+    "Retail": ("TRENT.NS", "TITAN.NS", "DMART.NS"),
+    "Hotels": ("INDHOTEL.NS", "EIHOTEL.NS"),
+    "Consumer Durables": ("HAVELLS.NS", "VOLTAS.NS", "DIXON.NS"), # Electronics/Appliances
+    "Auto Components": ("MOTHERSON.NS", "BOSCHLTD.NS"),
 
     # --- MATERIALS & HEALTH ---
-    "Healthcare": ["SUNPHARMA.NS", "DIVISLAB.NS", "APOLLOHOSP.NS"],
-    "Metals": ["TATASTEEL.NS", "HINDALCO.NS", "JSWSTEEL.NS"],
-    "Chemicals": ["PIDILITIND.NS", "SRF.NS"],
-    "Materials": ["ULTRACEMCO.NS", "AMBUJACEM.NS"], # Cement/Building Materials
+    "Healthcare": ("SUNPHARMA.NS", "DIVISLAB.NS", "APOLLOHOSP.NS"),
+    "Metals": ("TATASTEEL.NS", "HINDALCO.NS", "JSWSTEEL.NS"),
+    "Chemicals": ("PIDILITIND.NS", "SRF.NS"),
+    "Materials": ("ULTRACEMCO.NS", "AMBUJACEM.NS"), # Cement/Building Materials
 
     # --- OTHERS ---
-    "Realty": ["DLF.NS", "GODREJPROP.NS"],
-    "Telecom": ["BHARTIARTL.NS"],
+    "Realty": ("DLF.NS", "GODREJPROP.NS"),
+    "Telecom": ("BHARTIARTL.NS",),
     
     # --- FALLBACK ---
-    "Universal": ["NIFTYBEES.NS"]
-}
+    "Universal": ("NIFTYBEES.NS",)
+})
+
+# Reverse index: captain ticker -> sector (one hashed lookup instead of scanning the lists)
+CAPTAIN_TO_SECTOR = MappingProxyType({
+    ticker: sector for sector, captains in SECTOR_CAPTAINS.items() for ticker in captains
+})
 
 # Fallback values (Safety net only)
-FALLBACK_SECTOR_PE = {
+FALLBACK_SECTOR_PE = MappingProxyType({
     "Financials": 18.0, 
     "IT": 26.0, 
     "FMCG": 55.0, 
@@ -78,117 +105,154 @@ FALLBACK_SECTOR_PE = {
     "Consumer Durables": 50.0,
     "Healthcare": 30.0,
     "Unknown": 20.0
-}
-
-SECTOR_MAP = {
-    # Financials
-    "360ONE": "Financials",
-    "ABCAPITAL": "Financials",
-    "BAJAJHFL": "Financials",
-    "BAJFINANCE": "Financials",
-    "HDFCBANK": "Financials",
-    "HDFCLIFE": "Financials",
-    "IEX": "Financials",
-    "JIOFIN": "Financials",
-    "KOTAKBANK": "Financials",
-    "SBICARD": "Financials",
-    "SBIN": "Financials",
-
-    # IT / Telecom
-    "HFCL": "Telecom",
-    "KPITTECH": "IT",
-    "MPHASIS": "IT",
-    "NETWEB": "IT",
-    "OPTIEMUS": "IT",  # Electronics / Hardware -> Could map to Durables, but IT is safe
-    "PERSISTENT": "IT",
-    "RAILTEL": "Telecom",
-    "STLTECH": "Telecom",
-
-    # Energy / Power / Oil
-    "ATL": "Power",  # Adani Energy Solutions
-    "IOC": "Energy",
-    "NHPC": "Power",
-    "OIL": "Energy",
-    "RELIANCE": "Energy",
-    "TATAPOWER": "Power",
-
-    # Auto Components
-    "MMFL": "Auto Components",
-    "MOTHERSON": "Auto Components",
-    "MSUMI": "Auto Components",
-    "RANEHOLDIN": "Auto Components",
-    "SONACOMS": "Auto Components",
-
-    # FMCG / Consumer Staples
-    "AVTNPL": "FMCG",
-    "EIDPARRY": "FMCG",
-    "GODREJAGRO": "FMCG",
-    "ITC": "FMCG",
-    "KRBL": "FMCG",
-    "LTFOODS": "FMCG",
-    "VBL": "FMCG",
-
-    # Chemicals / Fertilizers
-    "CHAMBLFERT": "Chemicals",
-    "DEEPAKFERT": "Chemicals",
-    "JUBLINGREA": "Chemicals",
-    "LXCHEM": "Chemicals",
-    "RCF": "Chemicals",
-    "SHARDACROP": "Chemicals",
-    "SUMICHEM": "Chemicals",
-
-    # Capital Goods / Defence / Engineering
-    "HAL": "Defence",
-    "JASH": "Capital Goods",
-    "KPIL": "Infrastructure",
-    "RAYMOND": "Capital Goods",  # Core Engineering/Realty entity
-    "SHAKTIPUMP": "Capital Goods",
-    "TITAGARH": "Capital Goods",
-    "WALCHANNAG": "Capital Goods",
-
-    # Consumer Discretionary / Retail
-    "CHALET": "Hotels",
-    "RAYMONDLSL": "Retail",  # Lifestyle/Textiles
-    "TRENT": "Retail",
-
-    # Metals & Mining
-    "HINDALCO": "Metals",
-    "NATIONALUM": "Metals",
-
-    # Materials / Packaging / Cement
-    "EPL": "Materials",
-    "ORIENTCEM": "Materials",
-    "TIMETECHNO": "Materials",
-
-    # Services / Logistics / Ports
-    "ADANIENT": "Services",
-    "ADANIPORTS": "Services",
-    "ESSARSHPNG-BE": "Services",
-    "IRCTC": "Services",
-    "NAVKARCORP": "Services",
-
-    # Realty
-    "ANANTRAJ": "Realty",
-    "RAYMONDREL": "Realty",
-
-    # Healthcare
-    "MANKIND": "Healthcare",
-
-    # ETFs & Sovereign Gold Bonds (Commodities)
-    "GOLDBEES": "ETF",
-    "GOLDCASE": "ETF",
-    "NIFTYBEES": "ETF",
-    "SGBJUN31I-GB": "Commodities",
-    "SGBMAY29I-GB": "Commodities",
-    "SGBMR29XII-GB": "Commodities",
-    "SGBSEP28VI-GB": "Commodities"
-}
-
-RISK_THRESHOLDS = {
-    "single_stock_high": 15.0,   # %
-    "top3_high": 45.0,
-    "top5_high": 65.0
-}
-
-
-MAX_PORTFOLIO_ACTIONS = 10
\ No newline at end of file
+})
+
+# Symbol -> sector, packed as "SYMBOL=Sector" lines (one string constant, split once at import).
+# Blank lines and "#" comments are ignored.
+_SECTOR_MAP_RAW = """\
+# Financials
+360ONE=Financials
+ABCAPITAL=Financials
+BAJAJHFL=Financials
+BAJFINANCE=Financials
+HDFCBANK=Financials
+HDFCLIFE=Financials
+IEX=Financials
+JIOFIN=Financials
+KOTAKBANK=Financials
+SBICARD=Financials
+SBIN=Financials
+
+# IT / Telecom
+HFCL=Telecom
+KPITTECH=IT
+MPHASIS=IT
+NETWEB=IT
+OPTIEMUS=IT  # Electronics / Hardware -> Could map to Durables, but IT is safe
+PERSISTENT=IT
+RAILTEL=Telecom
+STLTECH=Telecom
+
+# Energy / Power / Oil
+ATL=Power  # Adani Energy Solutions
+IOC=Energy
+NHPC=Power
+OIL=Energy
+RELIANCE=Energy
+TATAPOWER=Power
+
+# Auto Components
+MMFL=Auto Components
+MOTHERSON=Auto Components
+MSUMI=Auto Components
+RANEHOLDIN=Auto Components
+SONACOMS=Auto Components
+
+# FMCG / Consumer Staples
+AVTNPL=FMCG
+EIDPARRY=FMCG
+GODREJAGRO=FMCG
+ITC=FMCG
+KRBL=FMCG
+LTFOODS=FMCG
+VBL=FMCG
+
+# Chemicals / Fertilizers
+CHAMBLFERT=Chemicals
+DEEPAKFERT=Chemicals
+JUBLINGREA=Chemicals
+LXCHEM=Chemicals
+RCF=Chemicals
+SHARDACROP=Chemicals
+SUMICHEM=Chemicals
+
+# Capital Goods / Defence / Engineering
+HAL=Defence
+JASH=Capital Goods
+KPIL=Infrastructure
+RAYMOND=Capital Goods  # Core Engineering/Realty entity
+SHAKTIPUMP=Capital Goods
+TITAGARH=Capital Goods
+WALCHANNAG=Capital Goods
+
+# Consumer Discretionary / Retail
+CHALET=Hotels
+RAYMONDLSL=Retail  # Lifestyle/Textiles
+TRENT=Retail
+
+# Metals & Mining
+HINDALCO=Metals
+NATIONALUM=Metals
+
+# Materials / Packaging / Cement
+EPL=Materials
+ORIENTCEM=Materials
+TIMETECHNO=Materials
+
+# Services / Logistics / Ports
+ADANIENT=Services
+ADANIPORTS=Services
+ESSARSHPNG-BE=Services
+IRCTC=Services
+NAVKARCORP=Services
+
+# Realty
+ANANTRAJ=Realty
+RAYMONDREL=Realty
+
+# Healthcare
+MANKIND=Healthcare
+
+# ETFs & Sovereign Gold Bonds (Commodities)
+GOLDBEES=ETF
+GOLDCASE=ETF
+NIFTYBEES=ETF
+SGBJUN31I-GB=Commodities
+SGBMAY29I-GB=Commodities
+SGBMR29XII-GB=Commodities
+SGBSEP28VI-GB=Commodities
+"""
+
+def _parse_sector_map(raw: str) -> dict:
+    pairs = (line.partition("#")[0].strip() for line in raw.splitlines())
+    return {
+        symbol.strip(): sys.intern(sector.strip())
+        for symbol, _, sector in (pair.partition("=") for pair in pairs if pair)
+    }
+
+SECTOR_MAP = MappingProxyType(_parse_sector_map(_SECTOR_MAP_RAW))
+
+# Intern sector names so every table (and every engine comparing against them) shares one object per sector
+# (SECTOR_MAP values are interned as they are parsed)
+FALLBACK_SECTOR_PE = MappingProxyType({sys.intern(sector): pe for sector, pe in FALLBACK_SECTOR_PE.items()})
+
+# Stable small-integer sector codes (int8-sized) for array aggregation; SECTOR_NAMES[code] recovers the name
+SECTOR_NAMES = tuple(sorted(set(SECTOR_MAP.values()) | {"Unknown"}))
+SECTOR_CODE = MappingProxyType({sector: code for code, sector in enumerate(SECTOR_NAMES)})
+SECTOR_CODE_MAP = MappingProxyType({symbol: SECTOR_CODE[sector] for symbol, sector in SECTOR_MAP.items()})
+
+# FALLBACK_SECTOR_PE as a lookup table indexed by sector code (sectors without a baseline get the "Unknown" one)
+FALLBACK_PE_LUT = np.full(len(SECTOR_NAMES), FALLBACK_SECTOR_PE["Unknown"], dtype=np.float32)
+for _sector, _pe in FALLBACK_SECTOR_PE.items():
+    if _sector in SECTOR_CODE:
+        FALLBACK_PE_LUT[SECTOR_CODE[_sector]] = _pe
+FALLBACK_PE_LUT.flags.writeable = False
+del _sector, _pe
+
+def sector_of(symbol: str, default: str = "Unknown") -> str:
+    """Single-symbol sector lookup; column-wise callers should keep using SECTOR_MAP with Series.map."""
+    return SECTOR_MAP.get(symbol, default)
+
+# Concentration limits as plain module scalars (hot checks read these directly)
+SINGLE_STOCK_HIGH: Final[float] = 15.0   # %
+TOP3_HIGH: Final[float] = 45.0
+TOP5_HIGH: Final[float] = 65.0
+
+RISK_THRESHOLDS = MappingProxyType({
+    "single_stock_high": SINGLE_STOCK_HIGH,
+    "top3_high": TOP3_HIGH,
+    "top5_high": TOP5_HIGH
+})
+
+
+MAX_PORTFOLIO_ACTIONS: Final[int] = 10
\ No newline at end of file